@@ -0,0 +1,166 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+from datetime import datetime
+
+from generate import PLATFORMS, generate
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+METHODS = ['stats', 'plot_daily_count', 'plot_senders_receivers', 'plot_hour_activity', 'plot_wordcloud', 'plot_emoji',
+           'plot_users', 'plot_comparison']
+
+# drawn only in the report of myself
+MYSELF_ONLY = {'plot_users', 'plot_comparison'}
+
+BENCHMARKS = ['import'] + ['parse:' + x for x in PLATFORMS] + ['load', 'index'] + ['analyzer:' + x for x in METHODS] + ['run']
+
+LANGUAGES = {'italian': 'it', 'english': 'en'}
+
+NOW = datetime(2024, 1, 1)
+
+
+def chat_args(chats, data, output, myself, extra, platforms):
+    argv = ['-m', myself, '-o', output] + extra
+    for platform in platforms:
+        argv += ['--' + platform, os.path.join(data, platform)]
+    return chats.arguments().parse_args(argv)
+
+
+def prepare(chats, analysis):
+    # tokenize only uses the tokenizer of the pipeline, a blank one of the same language gives the same tokens
+    import spacy
+    df_msg, first_year = chats.load({})
+    is_text = (df_msg['kind'] == 'text').values
+    tokens = np.full(len(df_msg), '', dtype=object)
+    tokens[is_text] = analysis.tokenize(df_msg['text'].values[is_text], spacy.blank(LANGUAGES[chats.args.language]))
+    df_msg['tokens'] = tokens
+    single_convs = df_msg[~df_msg['group']]
+    return df_msg, first_year, single_convs
+
+
+def measure(name, data, myself, extra):
+    # runs in its own process, so that the peak memory is the one of this benchmark alone
+    os.chdir(SRC)
+    sys.path.insert(0, SRC)
+    import profiler
+    start = time.perf_counter()
+    import chats
+    import analysis
+    if name == 'import':
+        return {'messages': 0, 'seconds': time.perf_counter() - start, 'peak': profiler.peak_rss()}
+
+    output = tempfile.mkdtemp(prefix='bench_')
+    kind, _, target = name.partition(':')
+    platforms = [target] if kind == 'parse' else list(PLATFORMS)
+    chats.args = chat_args(chats, data, output, myself, extra, platforms)
+    try:
+        if kind == 'parse':
+            start = time.perf_counter()
+            messages = len(chats.parse())
+        elif kind == 'load':
+            start = time.perf_counter()
+            messages = len(chats.load({})[0])
+        elif kind == 'index':
+            df_msg, _, single_convs = prepare(chats, analysis)
+            start = time.perf_counter()
+            analysis.MessageIndex(df_msg, single_convs)
+            messages = len(df_msg)
+        elif kind == 'analyzer':
+            df_msg, first_year, single_convs = prepare(chats, analysis)
+            index = analysis.MessageIndex(df_msg, single_convs)
+            owners = df_msg.groupby('user', observed=True).indices
+            users = [myself] if target in MYSELF_ONLY else sorted(owners)
+            start = time.perf_counter()
+            for user in users:
+                msgs = df_msg.iloc[owners[user]] if user != myself else df_msg
+                getattr(analysis.Analyzer(chats.args, user, msgs, index, first_year, NOW), target)()
+            messages = len(df_msg)
+        else:
+            chats.args.force = True
+            start = time.perf_counter()
+            chats.run()
+            with open(os.path.join(output, 'manifest.json'), 'r', encoding='utf-8') as json_file:
+                messages = json.load(json_file)[myself]['messages']
+        seconds = time.perf_counter() - start
+    finally:
+        shutil.rmtree(output, ignore_errors=True)
+
+    return {'messages': messages, 'seconds': seconds, 'peak': profiler.peak_rss()}
+
+
+def spawn(name, data, myself, extra):
+    command = [sys.executable, os.path.abspath(__file__), '--single', name, '--data', data, '--myself', myself]
+    result = subprocess.run(command + ['--'] + extra, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        print('Error while running {0}\n{1}'.format(name, result.stderr.strip().splitlines()[-1:]))
+        return None
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def megabytes(value):
+    return '-' if value is None else '{0:.0f}'.format(value / 2 ** 20)
+
+
+def throughput(result):
+    return '-' if result['messages'] == 0 else '{0:.0f}'.format(result['messages'] / result['seconds'])
+
+
+def ratio(value, base):
+    return '-' if value is None or base is None or base == 0 else '{0:.2f}x'.format(value / base)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='arguments after -- are passed to chats.py')
+    parser.add_argument('-n', '--messages', type=int, help='messages of the generated exports', default=100000)
+    parser.add_argument('-d', '--data', type=str, help='exports folder, generated when missing')
+    parser.add_argument('-m', '--myself', type=str, help='own username', default='Jean')
+    parser.add_argument('-r', '--repeat', type=int, help='runs of each benchmark, the fastest is kept', default=1)
+    parser.add_argument('--save', type=str, help='write the results to a baseline file')
+    parser.add_argument('--compare', type=str, help='compare the results with a baseline file')
+    parser.add_argument('--single', type=str, help=argparse.SUPPRESS)
+    parser.add_argument('benchmarks', type=str, help='benchmarks to run, by prefix', nargs='*')
+
+    argv = sys.argv[1:]
+    extra = argv[argv.index('--') + 1:] if '--' in argv else []
+    args = parser.parse_args(argv[:len(argv) - len(extra) - 1] if '--' in argv else argv)
+    data = os.path.abspath(args.data or os.path.join(tempfile.gettempdir(), 'chat_bench_{0}'.format(args.messages)))
+
+    if args.single is not None:
+        print(json.dumps(measure(args.single, data, args.myself, extra)))
+        sys.exit()
+
+    if not os.path.exists(data):
+        print('Generating {0} messages in {1}'.format(args.messages, data))
+        generate(data, args.messages, myself=args.myself)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as json_file:
+            baseline = json.load(json_file)
+
+    names = [x for x in BENCHMARKS if len(args.benchmarks) == 0 or any(x.startswith(y) for y in args.benchmarks)]
+    results = {}
+    print('{0:<34}{1:>10}{2:>10}{3:>12}{4:>10}{5:>10}{6:>10}'.format('benchmark', 'messages', 'seconds', 'msg/s',
+                                                                   'peak MB', 'time', 'memory'))
+    for name in names:
+        runs = [x for x in (spawn(name, data, args.myself, extra) for _ in range(args.repeat)) if x is not None]
+        if len(runs) == 0:
+            continue
+        result = min(runs, key=lambda x: x['seconds'])
+        results[name] = result
+        base = baseline.get(name, {})
+        print('{0:<34}{1:>10}{2:>10.2f}{3:>12}{4:>10}{5:>10}{6:>10}'.format(
+            name, result['messages'], result['seconds'], throughput(result),
+            megabytes(result['peak']), ratio(result['seconds'], base.get('seconds')),
+            ratio(result['peak'], base.get('peak'))))
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as json_file:
+            json.dump(results, json_file, indent=1)
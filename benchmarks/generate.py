@@ -0,0 +1,305 @@
+import os
+import json
+import random
+import argparse
+from datetime import datetime, timedelta, timezone
+
+NAMES = ['Emily', 'Luke', 'Anna', 'Marco', 'Zoë', 'Noè', 'Sara', 'Tom', 'Giulia', 'Chloé', 'Paolo', 'Kate', 'Niccolò',
+         'Ivan', 'Laura', 'José']
+
+WORDS = {'en': 'hello how are you fine thanks see you tomorrow evening at home work pizza movie let us go out today '
+               'really good morning night great idea maybe later call me when you are free'.split(),
+         'it': 'ciao come stai bene grazie ci vediamo domani sera a casa lavoro pizza cinema andiamo fuori oggi '
+               'davvero buongiorno notte ottima idea magari dopo chiamami quando sei libero'.split()}
+
+EMOJIS = ['😀', '😂', '❤️', '👍🏽', '🙏', '🎉', '😍', '👨‍👩‍👧', '🇮🇹', '☺', '5️⃣']
+
+SKYPE_EMOTICONS = [('smile', ':)'), ('wink', ';)'), ('laugh', ':D'), ('heart', '(heart)'), ('cool', '(cool)')]
+
+LINK = 'https://www.example.com/p/{0}'
+
+WHATSAPP = {'en': {'file': 'WhatsApp Chat with {0}.txt', 'media': '<Media omitted>',
+                   'deleted': 'This message was deleted', 'group': '{0} created group "{1}"'},
+            'it': {'file': 'Chat WhatsApp con {0}.txt', 'media': '<Media omessi>',
+                   'deleted': 'Questo messaggio è stato eliminato', 'group': '{0} ha creato il gruppo "{1}"'}}
+
+# share of the messages of each platform
+PLATFORMS = {'whatsapp': 0.4, 'telegram': 0.25, 'instagram': 0.15, 'skype': 0.2}
+
+START = datetime(2018, 1, 1)
+
+END = datetime(2023, 12, 31)
+
+TELEGRAM_PAGE = 1000
+
+TELEGRAM_HEAD = '''<!DOCTYPE html>
+<html>
+ <head>
+  <meta charset="utf-8"/>
+  <title>Exported Data</title>
+ </head>
+ <body>
+  <div class="page_wrap">
+   <div class="page_header">
+    <div class="content">
+     <div class="text bold">
+{0}
+     </div>
+    </div>
+   </div>
+   <div class="page_body chat_page">
+    <div class="history">
+'''
+
+TELEGRAM_TAIL = '''    </div>
+   </div>
+  </div>
+ </body>
+</html>
+'''
+
+TELEGRAM_SERVICE = '''
+ <div class="message service" id="message{0}">
+  <div class="body details">
+{1}
+  </div>
+ </div>
+'''
+
+TELEGRAM_MESSAGE = '''
+ <div class="message default clearfix{0}" id="message{1}">
+  <div class="pull_left userpic_wrap">
+   <div class="userpic userpic1" style="width: 42px; height: 42px">
+   </div>
+  </div>
+  <div class="body">
+   <div class="pull_right date details" title="{2}">
+{3}
+   </div>
+{4}
+  </div>
+ </div>
+'''
+
+TELEGRAM_FROM = '''   <div class="from_name">
+{0}
+   </div>
+'''
+
+TELEGRAM_TEXT = '''   <div class="text">
+{0}
+   </div>
+'''
+
+TELEGRAM_PHOTO = '''   <div class="media_wrap clearfix">
+    <a class="photo_wrap clearfix pull_left" href="photos/photo_{0}.jpg">
+     <img class="photo" src="photos/photo_{0}_thumb.jpg" style="width: 260px; height: 195px"/>
+    </a>
+   </div>
+'''
+
+
+def text(rng, lang):
+    words = rng.choices(WORDS[lang], k=rng.randint(1, 16))
+    r = rng.random()
+    if r < 0.15:
+        words.append(rng.choice(EMOJIS) * rng.randint(1, 3))
+    elif r < 0.2:
+        # attached to a word
+        i = rng.randrange(len(words))
+        words[i] += rng.choice(EMOJIS)
+    return ' '.join(words)
+
+
+def kind(rng, deleted=True):
+    r = rng.random()
+    if r < 0.06:
+        return 'media'
+    if r < 0.09:
+        return 'link'
+    if r < 0.1 and deleted:
+        return 'deleted'
+    return 'text'
+
+
+def dates(rng, n):
+    span = (END - START).total_seconds()
+    return [START + timedelta(seconds=int(x)) for x in sorted(rng.random() * span for _ in range(n))]
+
+
+def conversations(rng, n, contacts, myself, prefix):
+    # skewed sizes, as real chats are: a few long ones and many short ones. Every fifth chat is a group
+    weights = [1 / (i + 1) for i in range(contacts)]
+    sizes = [int(n * w / sum(weights)) for w in weights]
+    sizes[0] += n - sum(sizes)
+
+    convs = []
+    for i, size in enumerate(sizes):
+        if i % 5 == 4:
+            members = rng.sample(NAMES, rng.randint(2, 5))
+            convs.append(('{0} group {1}'.format(prefix, i), [myself] + members, size))
+        else:
+            name = NAMES[i % len(NAMES)] + ('' if i < len(NAMES) else ' ' + str(i // len(NAMES)))
+            convs.append((name, [myself, name], size))
+    return convs
+
+
+def whatsapp(folder, rng, n, contacts, myself):
+    os.makedirs(folder, exist_ok=True)
+    for i, (name, people, size) in enumerate(conversations(rng, n, contacts, myself, 'Whatsapp')):
+        lang = 'en' if i % 2 == 0 else 'it'
+        pattern = WHATSAPP[lang]
+        group = len(people) > 2
+        lines = []
+        for date in dates(rng, size):
+            k = kind(rng)
+            if k == 'media':
+                body = pattern['media']
+            elif k == 'link':
+                body = LINK.format(rng.randrange(10 ** 6))
+            elif k == 'deleted':
+                body = pattern['deleted']
+            else:
+                body = text(rng, lang)
+                if rng.random() < 0.03:
+                    body += '\n' + text(rng, lang)
+            day = (date.month, date.day) if lang == 'en' else (date.day, date.month)
+            lines.append('{0}/{1}/{2:02d}, {3}:{4:02d} - {5}: {6}'.format(*day, date.year % 100, date.hour, date.minute,
+                                                                         rng.choice(people), body))
+
+        if group:
+            lines.insert(0, '{0}/{1}/{2:02d}, 0:00 - {3}'.format(START.month, START.day, START.year % 100,
+                                                              pattern['group'].format(myself, name)))
+        with open(os.path.join(folder, pattern['file'].format(name)), 'w', encoding='utf-8') as out:
+            out.write('\n'.join(lines) + '\n')
+
+
+def telegram(folder, rng, n, contacts, myself):
+    for i, (name, people, size) in enumerate(conversations(rng, n, contacts, myself, 'Telegram')):
+        chat = os.path.join(folder, 'chat_{0:03d}'.format(i))
+        os.makedirs(chat, exist_ok=True)
+        group = len(people) > 2
+        messages = dates(rng, size)
+        last = None
+        for page in range(max(1, (size + TELEGRAM_PAGE - 1) // TELEGRAM_PAGE)):
+            out = [TELEGRAM_HEAD.format(name)]
+            if page == 0:
+                out.append(TELEGRAM_SERVICE.format(-1, START.strftime('%d %B %Y')))
+                out.append(TELEGRAM_SERVICE.format(-2, '{0} created group &laquo;{1}&raquo;'.format(myself, name)
+                                                   if group else '{0} joined Telegram'.format(name)))
+            for j in range(page * TELEGRAM_PAGE, min(size, (page + 1) * TELEGRAM_PAGE)):
+                date = messages[j]
+                who = rng.choice(people)
+                joined = who == last and rng.random() < 0.7
+                last = who
+                k = kind(rng, deleted=False)
+                if k == 'media':
+                    body = TELEGRAM_PHOTO.format(j)
+                elif k == 'link':
+                    url = LINK.format(rng.randrange(10 ** 6))
+                    body = TELEGRAM_TEXT.format('<a href="{0}">{0}</a>'.format(url))
+                else:
+                    body = text(rng, 'it')
+                    if rng.random() < 0.03:
+                        body += '<br>' + text(rng, 'it')
+                    body = TELEGRAM_TEXT.format(body)
+                if not joined:
+                    body = TELEGRAM_FROM.format(who) + body
+                out.append(TELEGRAM_MESSAGE.format(' joined' if joined else '', j,
+                                                   date.strftime('%d.%m.%Y %H:%M:%S UTC+01:00'),
+                                                   date.strftime('%H:%M'), body))
+            out.append(TELEGRAM_TAIL)
+            page_name = 'messages.html' if page == 0 else 'messages{0}.html'.format(page + 1)
+            with open(os.path.join(chat, page_name), 'w', encoding='utf-8') as page_file:
+                page_file.write(''.join(out))
+
+
+def mojibake(value):
+    # instagram writes the utf-8 bytes of its strings as latin1 characters
+    return value.encode('utf-8').decode('latin1')
+
+
+def instagram(folder, rng, n, contacts, myself):
+    for i, (name, people, size) in enumerate(conversations(rng, n, contacts, myself, 'Instagram')):
+        chat = os.path.join(folder, '{0}_{1}'.format(name.lower().replace(' ', ''), i))
+        os.makedirs(chat, exist_ok=True)
+        messages = []
+        for date in reversed(dates(rng, size)):
+            msg = {'sender_name': mojibake(rng.choice(people)),
+                   'timestamp_ms': int(date.replace(tzinfo=timezone.utc).timestamp() * 1000)}
+            k = kind(rng, deleted=False)
+            if k == 'link':
+                msg['share'] = {'link': LINK.format(rng.randrange(10 ** 6))}
+            elif k == 'media':
+                msg['photos'] = [{'uri': 'messages/inbox/photos/{0}.jpg'.format(rng.randrange(10 ** 6))}]
+            else:
+                msg['content'] = mojibake(text(rng, 'en'))
+            messages.append(msg)
+
+        data = {'participants': [{'name': mojibake(x)} for x in people], 'messages': messages,
+                'title': mojibake(name), 'is_still_participant': True, 'thread_type': 'Regular'}
+        with open(os.path.join(chat, 'message_1.json'), 'w', encoding='utf-8') as json_file:
+            json.dump(data, json_file)
+
+
+def skype(folder, rng, n, contacts, myself):
+    os.makedirs(folder, exist_ok=True)
+    conversations_list = []
+    for i, (name, people, size) in enumerate(conversations(rng, n, contacts, myself, 'Skype')):
+        group = len(people) > 2
+        messages = []
+        for j, date in enumerate(dates(rng, size)):
+            k = kind(rng, deleted=False)
+            if k == 'media':
+                content = '<URIObject type="Picture.1" uri="https://api.asm.skype.com/v1/objects/{0}">' \
+                          '<Title/><Description/>Picture</URIObject>'.format(j)
+            elif k == 'link':
+                content = '<a href="{0}">{0}</a>'.format(LINK.format(rng.randrange(10 ** 6)))
+            else:
+                content = text(rng, 'en')
+                r = rng.random()
+                if r < 0.1:
+                    emoticon, code = rng.choice(SKYPE_EMOTICONS)
+                    emoticon = '<ss type="{0}">{1}</ss>'.format(emoticon, code)
+                    content = emoticon if r < 0.05 else content + ' ' + emoticon
+            who = rng.choice(people)
+            messages.append({'id': str(j), 'displayName': None if who == myself else who,
+                             'originalarrivaltime': date.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+                             'messagetype': 'RichText', 'version': 1, 'content': content,
+                             'conversationid': '19:{0}@thread.skype'.format(i), 'from': '8:' + who.lower(),
+                             'properties': None, 'amsreferences': None})
+        conversations_list.append({'id': '19:{0}@thread.skype'.format(i), 'displayName': name, 'version': 1,
+                                   'properties': {'conversationblocked': False},
+                                   'threadProperties': {'membercount': len(people), 'topic': name} if group else None,
+                                   'MessageList': messages})
+
+    data = {'userId': '8:' + myself.lower(), 'exportDate': END.strftime('%Y-%m-%dT%H:%M'),
+            'conversations': conversations_list}
+    with open(os.path.join(folder, 'messages.json'), 'w', encoding='utf-8') as json_file:
+        json.dump(data, json_file)
+
+
+GENERATORS = {'whatsapp': whatsapp, 'telegram': telegram, 'instagram': instagram, 'skype': skype}
+
+
+def generate(output, messages, contacts=12, myself='Jean', seed=0, platforms=None):
+    # each platform has its own random generator, the exports of one do not change with the others
+    platforms = platforms or list(PLATFORMS)
+    total = sum(PLATFORMS[x] for x in platforms)
+    for i, platform in enumerate(platforms):
+        rng = random.Random(seed * 100 + list(PLATFORMS).index(platform))
+        count = int(messages * PLATFORMS[platform] / total)
+        GENERATORS[platform](os.path.join(output, platform), rng, count, contacts, myself)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-o', '--output', type=str, help='output folder', required=True)
+    parser.add_argument('-n', '--messages', type=int, help='messages of all the platforms', default=100000)
+    parser.add_argument('-c', '--contacts', type=int, help='chats of each platform', default=12)
+    parser.add_argument('-m', '--myself', type=str, help='own username', default='Jean')
+    parser.add_argument('-s', '--seed', type=int, help='random seed', default=0)
+    parser.add_argument('platforms', type=str, help='platforms to generate, all by default', nargs='*')
+
+    args = parser.parse_args()
+    generate(args.output, args.messages, args.contacts, args.myself, args.seed, args.platforms)
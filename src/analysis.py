@@ -1,39 +1,352 @@
 import io
+import os
+import re
+import json
+import hashlib
+import importlib
 import emoji
 from datetime import datetime
+from functools import lru_cache
+import numpy as np
 import pandas as pd
+from PIL import Image
 
-import seaborn as sns
-import matplotlib.pyplot as plt
-import plotly.express as px
-import plotly.graph_objects as go
-from wordcloud import WordCloud
+from drawings import SIZES
+
+# read when matplotlib is first imported
+os.environ['MPLBACKEND'] = 'Agg'
+
+
+class _Lazy:
+    # the charting libraries take seconds to import, each one is imported by the first chart that uses it
+    def __init__(self, name):
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(importlib.import_module(self.name), attr)
+
+
+matplotlib = _Lazy('matplotlib')
+plt = _Lazy('matplotlib.pyplot')
+font_manager = _Lazy('matplotlib.font_manager')
+sns = _Lazy('seaborn')
+px = _Lazy('plotly.express')
+go = _Lazy('plotly.graph_objects')
+wordcloud = _Lazy('wordcloud')
 
 TO_SKIP = ['$$media_omitted$$', '$$link$$']
 
+# px.colors.qualitative.Plotly
+PLOTLY_COLORS = ['#636EFA', '#EF553B', '#00CC96', '#AB63FA', '#FFA15A', '#19D3F3', '#FF6692', '#B6E880', '#FF97FF',
+                 '#FECB52']
+
+PLOTLY_TEXT = '#444444'
+
+# fonts tried in turn for the emoji labels, the missing ones are skipped
+EMOJI_FONTS = ['DejaVu Sans', 'Segoe UI Emoji', 'Noto Emoji', 'Symbola']
+
+EMOJI_CHUNK = 100000
+
+KEYCAP_MARKS = [0xfe0f, 0x20e3]
+
+WORDS_CHUNK = 100000
+
+# words as WordCloud.process_text finds them, and the separators of the messages joined in a chunk
+WORD = re.compile(r"\w[\w']*|\x00")
+
+
+def _alternation(words):
+    # a prefix tree written as a regex, longer sequences are tried first so that ZWJ sequences and skin tones
+    # are not split into their parts
+    tree = {}
+    for word in words:
+        node = tree
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(x) + build(node[x]) for x in sorted(node) if x]
+        if len(branches) == 0:
+            return ''
+        pattern = branches[0] if len(branches) == 1 and '' not in node else '(?:' + '|'.join(branches) + ')'
+        return pattern + '?' if '' in node else pattern
+
+    return build(tree)
+
+
+@lru_cache(maxsize=None)
+def _emoji_tables():
+    # built on first use, the pattern and the lookup of the code points found in emojis. Keycaps start with an
+    # ascii character, they are found from their marks
+    chars = np.zeros(0x110000, dtype=bool)
+    chars[[ord(x) for x in set(''.join(emoji.EMOJI_DATA)) if ord(x) >= 128]] = True
+    return re.compile(_alternation(emoji.EMOJI_DATA)), chars
+
+
+def extract_emojis(texts):
+    # runs of emoji code points are found over a whole chunk of messages at once, only those runs are
+    # matched against the emoji set. Returns the message of each emoji and the emojis
+    pattern, emoji_chars = _emoji_tables()
+    owners = []
+    emojis = []
+    for first in range(0, len(texts), EMOJI_CHUNK):
+        chunk = texts[first:first + EMOJI_CHUNK]
+        joined = '\n'.join(chunk)
+        codes = np.frombuffer(joined.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+        mask = np.concatenate(([False], emoji_chars[codes], [False]))
+        edges = np.flatnonzero(mask[1:] != mask[:-1])
+        starts, ends = edges[::2], edges[1::2]
+        starts = starts - ((starts > 0) & np.isin(codes[starts], KEYCAP_MARKS))
+
+        positions = []
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            for match in pattern.finditer(joined, start, end):
+                positions.append(match.start())
+                emojis.append(match.group())
+
+        bounds = np.cumsum(np.fromiter(map(len, chunk), dtype=np.int64, count=len(chunk)) + 1)
+        owners.append(np.searchsorted(bounds, positions, side='right') + first)
+
+    return np.concatenate(owners) if len(owners) > 0 else np.zeros(0, dtype=np.int64), emojis
+
+
+def _figure(size):
+    # matplotlib stand-ins for the plotly charts are drawn at 100 dpi, font sizes are in pixels as in plotly
+    return plt.figure(figsize=(size[0] / 100, size[1] / 100), dpi=100)
+
+
+def _save(fig, dpi=None):
+    # the rendered canvas is handed to the slides as it is, without a png in between
+    if dpi is not None:
+        fig.set_dpi(dpi)
+    fig.canvas.draw()
+    img = Image.fromarray(np.asarray(fig.canvas.buffer_rgba()))
+    plt.close(fig)
+    return img
+
+
+def _plotly_image(fig):
+    # kaleido only returns encoded images
+    return Image.open(io.BytesIO(fig.to_image()))
+
+
+def _polar(hours, perc, size):
+    fig = _figure(size)
+    ax = fig.add_axes([0.05, 0.06, 0.9, 0.88], projection='polar')
+    ax.set_theta_zero_location('N')
+    ax.set_theta_direction(-1)
+    ax.set_axisbelow(True)
+    theta = np.arange(len(hours)) * 2 * np.pi / len(hours)
+    ax.bar(theta, perc, width=2 * np.pi / len(hours), color=PLOTLY_COLORS[0], edgecolor='white', linewidth=1.5)
+    ax.set_xticks(theta, hours)
+    ax.set_rlabel_position(90)
+    ax.tick_params(labelsize=22 * 0.72, colors=PLOTLY_TEXT)
+    ax.grid(color='#ebf0f8')
+    ax.spines['polar'].set_visible(False)
+    return _save(fig)
+
+
+def _installed(families):
+    names = {x.name for x in font_manager.fontManager.ttflist}
+    return [x for x in families if x in names]
+
+
+def _text_color(color):
+    # contrasting text inside the slices, as plotly picks it
+    r, g, b = matplotlib.colors.to_rgb(color)
+    return PLOTLY_TEXT if (r * 299 + g * 587 + b * 114) / 1000 >= 0.5 else 'white'
+
+
+def _pie(labels, perc, size, font_size, min_font_size, hole=0., percent=False, legend_size=12, family=None):
+    # laid out as in plotly: counterclockwise with the first slice ending at the top, percentages of the slices shown.
+    # Labels share the largest size that fits all of them, down to min_font_size, the ones that do not fit are left out
+    perc = np.asarray(perc) / np.sum(perc) * 100
+    fig = _figure(size)
+    ax = fig.add_axes([0.02, 0.04, 0.7, 0.92])
+    wedges, _ = ax.pie(perc, colors=PLOTLY_COLORS, startangle=90 - 3.6 * perc[0] if len(perc) > 0 else 90,
+                       wedgeprops={'width': 1 - hole, 'edgecolor': 'white', 'linewidth': 1})
+    ax.set(xlim=(-1.02, 1.02), ylim=(-1.02, 1.02))
+
+    scale = ax.bbox.height / 2.04
+    texts = ['{0}\n{1:.1f}%'.format(x, y) if percent else x for x, y in zip(labels, perc)]
+    rooms = np.minimum(np.pi * (1 + hole) * scale * perc / 100, (1 - hole) * scale)
+    fitting = np.array([x / (0.6 * max(len(y) for y in z.split('\n')) + 0.4) for x, z in zip(rooms, texts)])
+    shown = fitting >= min_font_size
+    uniform = min(font_size, fitting[shown].min()) if shown.any() else font_size
+    for wedge, text in zip(np.array(wedges)[shown], np.array(texts, dtype=object)[shown]):
+        angle = np.deg2rad((wedge.theta1 + wedge.theta2) / 2)
+        ax.text(np.cos(angle) * (1 + hole) / 2, np.sin(angle) * (1 + hole) / 2, text, ha='center', va='center',
+                color=_text_color(wedge.get_facecolor()), fontsize=uniform * 0.72, family=family)
+
+    handle = 14 / legend_size
+    legend = fig.legend(wedges, labels, loc='upper left', bbox_to_anchor=(0.74, 0.96), frameon=False,
+                        fontsize=legend_size * 0.72, handlelength=handle, handleheight=handle, labelcolor=PLOTLY_TEXT)
+    for text in legend.get_texts():
+        text.set_family(family)
+    return _save(fig)
+
+
+def tokenize(texts, nlp, batch_size=1000, n_process=1, cache_dir=None):
+    cache = {}
+    cache_file = None
+    if cache_dir is not None:
+        meta = nlp.meta
+        cache_file = os.path.join(cache_dir, 'tokens_{0}_{1}-{2}.json'.format(meta['lang'], meta['name'],
+                                                                             meta['version']))
+        if os.path.exists(cache_file):
+            with open(cache_file, 'r', encoding='utf-8') as json_file:
+                cache = json.load(json_file)
+
+    keys = []
+    missing = {}
+    for msg in texts:
+        for r in TO_SKIP:
+            msg = msg.replace(r, '')
+
+        msg = msg.strip().lower()
+        key = hashlib.sha1(msg.encode('utf-8')).hexdigest()
+        keys.append(key)
+        if key not in cache:
+            missing[key] = msg
+
+    # is_stop and is_punct are lexical attributes, the tokenizer alone is enough
+    docs = nlp.pipe(missing.values(), batch_size=batch_size, n_process=n_process, disable=nlp.pipe_names)
+    for key, doc in zip(missing.keys(), docs):
+        cache[key] = ' '.join(token.text for token in doc if not token.is_stop and not token.is_punct)
+
+    if cache_file is not None and len(missing) > 0:
+        with open(cache_file, 'w', encoding='utf-8') as json_file:
+            json.dump(cache, json_file)
+
+    return [cache[key] for key in keys]
+
+
+def _prune(table, counters):
+    # Misra-Gries: every user keeps the counts above its (counters + 1)-th largest, less that one. At most counters
+    # words are left and each count is short of the real one by at most the words of the user / (counters + 1),
+    # tables pruned this way can be added up and pruned again with the same bound
+    if counters is None:
+        return table
+    table = table.sort_values(['user', 'count'], ascending=[True, False], kind='stable')
+    rank = table.groupby('user', sort=False).cumcount().values
+    cut = pd.Series(table['count'].values[rank == counters], index=table['user'].values[rank == counters])
+    table = table.assign(count=table['count'].values - cut.reindex(table['user'].values, fill_value=0).values)
+    return table[table['count'] > 0]
+
+
+def word_counts(users, tokens, counters=None):
+    # the words of each user counted as WordCloud.process_text does, one chunk of messages at a time
+    stopwords = set(x.lower() for x in wordcloud.STOPWORDS)
+    codes = users.cat.codes.values
+    table = pd.DataFrame({'user': np.zeros(0, dtype=codes.dtype), 'word': np.zeros(0, dtype=object),
+                          'count': np.zeros(0, dtype=np.int64)})
+    for first in range(0, len(tokens), WORDS_CHUNK):
+        joined = '\x00'.join(tokens[first:first + WORDS_CHUNK])
+        found, words = pd.factorize(np.array(WORD.findall(joined), dtype=object))
+        # separators, 's, numbers and stop words are found once per distinct word
+        breaks = np.array([x == '\x00' for x in words], dtype=bool)
+        owners = codes[first + np.cumsum(breaks[found])]
+        words = np.array([x[:-2] if x.lower().endswith("'s") else x for x in words], dtype=object)
+        keep = ~breaks & np.array([not x.isdigit() and x.lower() not in stopwords for x in words], dtype=bool)
+        chunk = pd.DataFrame({'user': owners[keep[found]], 'word': words[found[keep[found]]], 'count': 1})
+        table = pd.concat([table, chunk]).groupby(['user', 'word'], as_index=False, sort=False)['count'].sum()
+        table = _prune(table, counters)
+
+    user = pd.Categorical.from_codes(table['user'].values, users.cat.categories)
+    return pd.Series(table['count'].values, index=pd.MultiIndex.from_arrays([user, table['word'].values],
+                                                                            names=['user', 'word']), name='count')
+
+
+def _frequencies(counts):
+    # plurals are merged into their singular when both are there, as WordCloud.process_text does
+    words = counts.index
+    plural = words.str.endswith('s') & ~words.str.endswith('ss') & words.str[:-1].isin(words)
+    singular = counts[plural]
+    singular.index = singular.index.str[:-1]
+    return counts[~plural].add(singular, fill_value=0).to_dict()
+
+
+def _binned_kde(days, counts, gridsize=200, cut=3):
+    # the gaussian KDE of seaborn over the messages of each day, one kernel per day at its middle. The bandwidth
+    # follows Scott's rule on the messages themselves, so cost depends on the days and not on the messages
+    n = counts.sum()
+    days = days + .5
+    mean = np.average(days, weights=counts)
+    std = np.sqrt(np.sum(counts * (days - mean) ** 2) / (n - 1)) if n > 1 else 0
+    # as kdeplot, a single message or a single day has no density
+    if std == 0:
+        return None, None
+    bw = std * n ** -.2
+    grid = np.linspace(days.min() - bw * cut, days.max() + bw * cut, gridsize)
+    kernels = np.exp(-.5 * ((grid[np.newaxis, :] - days[:, np.newaxis]) / bw) ** 2)
+    return grid, counts @ kernels / (n * bw * np.sqrt(2 * np.pi))
+
+
+class MessageIndex:
+    # counts per user and day, hour and social, built in one pass over the messages and shared by every report
+    def __init__(self, df_msg, single_convs, counters=None):
+        keys = {'user': df_msg['user'], 'day': df_msg['datetime'].dt.normalize(),
+                'hour': df_msg['datetime'].dt.hour, 'social': df_msg['social']}
+        data = pd.DataFrame({'count': np.ones(len(df_msg), dtype=np.int64), 'words': df_msg['words'],
+                             'media': df_msg['kind'] == 'media', 'link': df_msg['kind'] == 'link'})
+        counts = data.groupby(list(keys.values()), observed=True).sum()
+        counts.index.names = list(keys.keys())
+
+        self.users = list(df_msg['user'].unique())
+        self.daily = counts.groupby(level=['user', 'day'], observed=True).sum()
+        # plain dates, as histplot bins them one per day
+        self.daily.index = self.daily.index.set_levels(self.daily.index.levels[1].date, level='day')
+        self.hourly = counts['count'].groupby(level=['user', 'hour'], observed=True).sum()
+        self.socials = counts['count'].groupby(level=['user', 'social'], observed=True).sum()
+        self.convs = single_convs.groupby(['conv', 'user'], observed=True).agg(count=('words', 'size'),
+                                                                              words=('words', 'sum'))
+
+        owners, emojis = extract_emojis(df_msg['text'].tolist())
+        found = pd.DataFrame({'user': df_msg['user'].values[owners], 'emoji': emojis})
+        self.emojis = found.groupby(['user', 'emoji'], observed=True).size()
+
+        # with counters the word counts of each user are bounded, see _prune
+        self.counters = counters
+        self.words = word_counts(df_msg['user'], df_msg['tokens'].values, counters)
+
 
 class Analyzer:
-    def __init__(self, args, user, msgs, conv, first_year, nlp):
+    def __init__(self, args, user, msgs, index, first_year, now):
         self.args = args
         self.user = user
         self.msgs = msgs
-        self.conv = conv
+        self.index = index
         self.first_year = first_year
-        self.nlp = nlp
+        self.now = now
+
+    def _subplots(self, chart, *args, **kwargs):
+        # the matplotlib renderer draws at the size of the slide, text is as large as in the resized 300 dpi images
+        if self.args.renderer == 'matplotlib':
+            width, height = SIZES[chart]
+            dpi = height / 4.8
+            return plt.subplots(*args, figsize=(width / dpi, 4.8), dpi=dpi, **kwargs)
+        return plt.subplots(*args, **kwargs)
+
+    def _savefig(self, fig):
+        return _save(fig, None if self.args.renderer == 'matplotlib' else 300)
+
+    def _select(self, table, level):
+        # myself covers every user
+        if self.user == self.args.myself:
+            return table.groupby(level=level, observed=True).sum()
+        if self.user not in table.index.get_level_values('user'):
+            return table.iloc[:0].droplevel('user')
+        return table.xs(self.user, level='user')
 
     def plot_hour_activity(self):
-        self.msgs['hour'] = self.msgs['datetime'].dt.hour
-        tot = self.msgs.shape[0]
-        df_hours = self.msgs.groupby('hour').agg(num=('hour', 'count'))
-        df_hours.reset_index(inplace=True)
-        df_hours = df_hours.rename(columns={'index': 'hour'})
-        missing = [x for x in range(24) if x not in df_hours['hour'].tolist()]
-        for h in missing:
-            df_hours = pd.concat([df_hours, pd.DataFrame({'hour': [h], 'num': [0]})])
-
-        df_hours = df_hours.sort_values(by='hour')
+        hours = self._select(self.index.hourly, 'hour')
+        tot = hours.sum()
+        df_hours = pd.DataFrame({'hour': range(24), 'num': hours.reindex(range(24), fill_value=0).values})
         df_hours['hour'] = df_hours['hour'].apply(lambda x: str(x))
         df_hours['perc'] = df_hours['num'].apply(lambda x: (x / tot) * 100)
+        if self.args.renderer == 'matplotlib':
+            return _polar(df_hours['hour'].tolist(), df_hours['perc'].values, SIZES['hour'])
 
         fig = go.Figure(go.Barpolar(r=df_hours.perc, theta=df_hours.hour))
         fig.update_layout(
@@ -47,59 +360,40 @@ class Analyzer:
             font=dict(size=20)
         )
 
-        img_buf = io.BytesIO()
-        fig.write_image(img_buf)
-        return img_buf
+        return _plotly_image(fig)
 
     def plot_daily_count(self):
-        fig, ax = plt.subplots(constrained_layout=True)
+        fig, ax = self._subplots('daily', constrained_layout=True)
         plt.xlabel(' ')
         plt.ylabel('Daily messages')
-        sns.histplot(data=self.msgs, x=self.msgs.date, binwidth=1)
+        daily = self._select(self.index.daily, 'day').reset_index()
+        sns.histplot(data=daily, x='day', weights='count', binwidth=1)
         ax.set_ylim(0, 300)
-        ax.set_xlim(datetime(self.first_year, 1, 1), datetime.now())
-        img_buf = io.BytesIO()
-        plt.savefig(img_buf, format='png', dpi=300)
-        plt.close()
-        return img_buf
+        ax.set_xlim(datetime(self.first_year, 1, 1), self.now)
+        return self._savefig(fig)
 
     def plot_wordcloud(self):
-        text = ''
-        for msg in self.msgs['text']:
-            for r in TO_SKIP:
-                msg = msg.replace(r, '')
-
-            if len(msg) == 0:
-                continue
-
-            doc = self.nlp(msg.strip().lower())
-            filtered_tokens = [token.text for token in doc if not token.is_stop and not token.is_punct]
-            text += ' '.join(filtered_tokens)
+        counts = self._select(self.index.words, 'word')
+        if self.user == self.args.myself:
+            counts = _prune(counts.reset_index().assign(user=0), self.index.counters).set_index('word')['count']
 
-        wordcloud = WordCloud(background_color="white", max_words=100, max_font_size=40,
-                              relative_scaling=.5).generate(text)
+        cloud = wordcloud.WordCloud(background_color="white", max_words=100, max_font_size=40,
+                                    relative_scaling=.5, random_state=0).generate_from_frequencies(_frequencies(counts))
 
-        plt.figure()
-        plt.imshow(wordcloud)
+        fig, ax = self._subplots('wordcloud')
+        plt.imshow(cloud)
         plt.axis("off")
-        img_buf = io.BytesIO()
-        plt.savefig(img_buf, format='png')
-        plt.close()
-        return img_buf
+        return _save(fig)
 
     def plot_emoji(self):
-        emojis = []
-        for msg in self.msgs['text']:
-            toks = [x for x in msg.split(' ') if x in emoji.EMOJI_DATA]
-            if len(toks) > 0:
-                emojis.extend(toks)
-
-        df_raw_emoji = pd.DataFrame({'emoji': emojis})
-        df_emoji = df_raw_emoji.groupby('emoji').agg(count=('emoji', 'count'))
-        df_emoji['perc'] = df_emoji['count'].apply(lambda x: (x / df_raw_emoji.shape[0]) * 100)
+        df_emoji = self._select(self.index.emojis, 'emoji').to_frame('count')
+        tot = df_emoji['count'].sum()
+        df_emoji['perc'] = df_emoji['count'].apply(lambda x: (x / tot) * 100)
         df_emoji.reset_index(inplace=True)
-        df_emoji = df_emoji.rename(columns={'index': 'emoji'})
         df_emoji = df_emoji.sort_values(by='perc', ascending=False).head(10)
+        if self.args.renderer == 'matplotlib':
+            return _pie(df_emoji['emoji'].tolist(), df_emoji['perc'].values, SIZES['emoji'], 30, 15,
+                        legend_size=30, family=_installed(EMOJI_FONTS))
 
         fig = px.pie(df_emoji, values='perc', names='emoji')
         fig.update_traces(textposition='inside', textinfo='label', textfont_size=30)
@@ -107,32 +401,34 @@ class Analyzer:
                           legend=dict(font=dict(size=30)),
                           margin=dict(l=5, r=5, t=20, b=20))
 
-        img_buf = io.BytesIO()
-        fig.write_image(img_buf)
-        return img_buf
+        return _plotly_image(fig)
 
     def plot_senders_receivers(self):
-        data = self.conv
+        convs = self.index.convs
         other_name = self.user
-
         if self.user == self.args.myself:
-            df_others = self.conv.copy(deep=True)
-            df_others['user'] = self.conv['user'].apply(lambda x: 'others' if x != self.args.myself else x)
-            data = df_others
+            data = convs.groupby(level='user', observed=True).sum()
             other_name = 'others'
+        elif self.user in convs.index.get_level_values('conv'):
+            data = convs.xs(self.user, level='conv')
+        else:
+            data = convs.iloc[:0].droplevel('conv')
 
-        fig, (ax1, ax2) = plt.subplots(1, 2)
+        sent = data[data.index == self.args.myself]
+        received = data[data.index != self.args.myself]
+        others = received['count'].sum() if self.user == self.args.myself else data['count'].get(other_name, 0)
+
+        fig, (ax1, ax2) = self._subplots('senders_receivers', 1, 2)
         plt.title(self.user)
 
-        sns.countplot(data=data, x=data.user, order=[other_name, self.args.myself],
-                      ax=ax1, palette=sns.color_palette("Paired"))
+        df_count = pd.DataFrame([(self.args.myself, sent['count'].sum()), (other_name, others)],
+                                columns=['user', 'count'])
+        sns.barplot(data=df_count, x='user', y='count', order=[other_name, self.args.myself],
+                    ax=ax1, palette=sns.color_palette("Paired"))
         ax1.set_xlabel(' ')
         ax1.set_ylabel(' ')
         ax1.set_title('Messages')
 
-        sent = data[data.user == self.args.myself]
-        received = data[data.user != self.args.myself]
-
         df_words = pd.DataFrame([(self.args.myself, sent['words'].sum()), (other_name, received['words'].sum())],
                                 columns=['user', 'sum'])
 
@@ -142,74 +438,81 @@ class Analyzer:
         ax2.set_ylabel(' ')
         ax2.yaxis.tick_right()
         ax2.set_title('Words')
-        img_buf = io.BytesIO()
-        plt.savefig(img_buf, format='png', dpi=300)
-        plt.close()
-        return img_buf
+        return self._savefig(fig)
 
     def plot_users(self):
-        df_raw_users = self.msgs[self.msgs['user'] != self.args.myself]
-        df_users = df_raw_users.groupby('user').agg(count=('text', 'count'))
-        df_users['perc'] = df_users['count'].apply(lambda x: (x / df_raw_users.shape[0]) * 100)
+        counts = self.index.daily['count'].groupby(level='user', observed=True).sum()
+        df_users = counts[counts.index != self.args.myself].to_frame()
+        tot = df_users['count'].sum()
+        df_users['perc'] = df_users['count'].apply(lambda x: (x / tot) * 100)
         df_users.reset_index(inplace=True)
-        df_users = df_users.rename(columns={'index': 'user'})
         df_users = df_users.sort_values(by='perc', ascending=False).head(10)
+        if self.args.renderer == 'matplotlib':
+            return _pie(df_users['user'].tolist(), df_users['perc'].values, SIZES['users'], 20, 12, hole=.3,
+                        percent=True)
 
         fig = go.Figure(data=[go.Pie(labels=df_users['user'], values=df_users['perc'], hole=.3)])
         fig.update_traces(textposition='inside', textinfo='percent+label', textfont_size=20)
         fig.update_layout(uniformtext_minsize=12, uniformtext_mode='hide', showlegend=True,
                           margin=dict(l=5, r=5, t=20, b=20))
 
-        img_buf = io.BytesIO()
-        fig.write_image(img_buf)
-        return img_buf
+        return _plotly_image(fig)
 
     def plot_comparison(self):
-        df_msg = self.msgs[self.msgs['user'] != self.args.myself]
+        daily = self.index.daily.reset_index()
+        daily = daily[daily['user'] != self.args.myself]
+        # users are drawn in order of appearance, as for plain strings
+        hue_order = [x for x in self.index.users if x != self.args.myself]
 
-        fig, ax = plt.subplots(constrained_layout=True)
+        fig, ax = self._subplots('final_hist', constrained_layout=True)
         plt.title(' ')
         plt.xlabel(' ')
         plt.ylabel('Daily messages')
-        g = sns.histplot(data=df_msg, x=df_msg.date, hue="user", element="step")
+        g = sns.histplot(data=daily, x='day', weights='count', hue="user", hue_order=hue_order, element="step")
         ax.set_ylim(0, 300)
-        ax.set_xlim(datetime(self.first_year, 1, 1), datetime.now())
+        ax.set_xlim(datetime(self.first_year, 1, 1), self.now)
         sns.move_legend(g, "upper left", title='')
+        img_buf_1 = self._savefig(fig)
 
-        img_buf_1 = io.BytesIO()
-        plt.savefig(img_buf_1, format='png', dpi=300)
-        plt.close()
-
-        fig, ax = plt.subplots(constrained_layout=True)
+        fig, ax = self._subplots('final_hist', constrained_layout=True)
         plt.title(' ')
         plt.xlabel(' ')
         plt.ylabel('Density')
-        g = sns.kdeplot(data=df_msg, x=df_msg.datetime, hue="user", bw_adjust=1)
-        ax.set_xlim(datetime(self.first_year, 1, 1), datetime.now())
+        # densities of the users scaled by their share of the messages, as kdeplot does with a hue
+        curves = []
+        total = daily['count'].sum()
+        for user, counts in daily.groupby('user', observed=True, sort=False):
+            days = np.array(counts['day'].values, dtype='datetime64[D]').astype(np.int64)
+            grid, density = _binned_kde(days, counts['count'].values)
+            if grid is not None:
+                curves.append(pd.DataFrame({'user': user, 'datetime': (grid * 86400e9).astype('datetime64[ns]'),
+                                            'density': density * counts['count'].sum() / total}))
+        curves = pd.concat(curves) if len(curves) > 0 else pd.DataFrame(columns=['user', 'datetime', 'density'])
+        g = sns.lineplot(data=curves, x='datetime', y='density', hue='user', hue_order=hue_order, estimator=None)
+        # as kdeplot, the first users are drawn on top and there is no margin below zero
+        for i, line in enumerate(ax.lines):
+            line.set_zorder(2 - i / len(ax.lines))
+            line.sticky_edges.y[:] = (0, np.inf)
+        ax.set_xlim(datetime(self.first_year, 1, 1), self.now)
         sns.move_legend(g, "upper left", title='')
-
-        img_buf_2 = io.BytesIO()
-        plt.savefig(img_buf_2, format='png', dpi=300)
-        plt.close()
+        img_buf_2 = self._savefig(fig)
 
         return img_buf_1, img_buf_2
 
     def stats(self):
-        tot_msg = self.msgs.shape[0]
-        tot_days = self.msgs['date'].unique().shape[0]
-        tot_words = self.msgs['words'].sum()
-
-        msg_per_day = self.msgs.groupby('date').agg(count=('words', 'count'))
-        word_per_day = self.msgs.groupby('date').agg(count=('words', 'sum'))
+        daily = self._select(self.index.daily, 'day')
+        tot_msg = daily['count'].sum()
+        tot_days = daily.shape[0]
+        tot_words = daily['words'].sum()
 
-        avg_msg_per_day = (msg_per_day.sum() / msg_per_day.shape[0])['count']
-        avg_word_per_day = (word_per_day.sum() / word_per_day.shape[0])['count']
+        avg_msg_per_day = tot_msg / tot_days
+        avg_word_per_day = tot_words / tot_days
 
-        media = self.msgs[self.msgs['text'] == '$$media_omitted$$'].shape[0]
-        link = self.msgs[self.msgs['text'] == '$$link$$'].shape[0]
+        media = daily['media'].sum()
+        link = daily['link'].sum()
         text = tot_msg - media - link
 
-        df_socials = self.msgs.groupby('social').agg(perc=('social', 'count'))
+        df_socials = self._select(self.index.socials, 'social').to_frame('perc')
         df_socials['perc'] = df_socials['perc'].apply(lambda x: (x / tot_msg) * 100)
 
         return {'user': self.user.upper(), 'tot_msg': tot_msg, 'tot_days': tot_days, 'tot_words': tot_words,
@@ -0,0 +1,59 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+from messages import COLUMNS, concat
+
+
+class MessageCache:
+    def __init__(self, folder):
+        self.data_file = os.path.join(folder, 'messages_cache.parquet')
+        self.index_file = os.path.join(folder, 'messages_cache.json')
+        self.checkpoint_file = os.path.join(folder, 'messages_checkpoints.json')
+        self.stamps = {}
+        self.units = {}
+        self.checkpoints = {}
+
+        if os.path.exists(self.data_file) and os.path.exists(self.index_file):
+            data = pd.read_parquet(self.data_file)
+            # caches written before content was kept are parsed again
+            if set(COLUMNS) <= set(data.columns):
+                with open(self.index_file, 'r', encoding='utf-8') as json_file:
+                    self.stamps = json.load(json_file)
+                if os.path.exists(self.checkpoint_file):
+                    with open(self.checkpoint_file, 'r', encoding='utf-8') as json_file:
+                        self.checkpoints = json.load(json_file)
+
+                for source, idx in data.groupby('source', sort=False, observed=True).indices.items():
+                    self.units[source] = {x: data[x].values[idx] for x in COLUMNS}
+
+    def get(self, source, stamp):
+        if self.stamps.get(source) != stamp or source not in self.units:
+            return None
+
+        return self.units[source]
+
+    def checkpoint(self, source):
+        # where the parse of a source that changed can resume, its messages up to there are the cached ones
+        return self.checkpoints.get(source) if source in self.units else None
+
+    def put(self, source, stamp, messages, checkpoint=None):
+        self.stamps[source] = stamp
+        self.units[source] = messages
+        if checkpoint is None:
+            self.checkpoints.pop(source, None)
+        else:
+            self.checkpoints[source] = checkpoint
+
+    def save(self):
+        sources = [x for x in self.units.keys() if os.path.exists(x)]
+        data = concat([self.units[x] for x in sources])
+        codes = np.repeat(np.arange(len(sources)), [len(self.units[x]['datetime']) for x in sources])
+        data['source'] = pd.Categorical.from_codes(codes, sources)
+        data.to_parquet(self.data_file, index=False)
+
+        with open(self.index_file, 'w', encoding='utf-8') as json_file:
+            json.dump({x: self.stamps[x] for x in sources}, json_file)
+        with open(self.checkpoint_file, 'w', encoding='utf-8') as json_file:
+            json.dump({x: self.checkpoints[x] for x in sources if x in self.checkpoints}, json_file)
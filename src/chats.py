@@ -1,115 +1,288 @@
 import os
-import re
 import argparse
-import spacy
 import json
+import hashlib
+import time
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from multiprocessing import Pool
 from tqdm import tqdm
 
 from parsers import whatsapp_parser, telegram_parser, instagram_parser, skype_parser
+from cache import MessageCache
+from pdf import PdfReport
+from profiler import Profiler
+from messages import concat, rename, compact, enrich
 from analysis import *
 from drawings import *
 
 
-def run():
-    rename = dict()
-    if args.rename:
-        with open(args.rename, 'r', encoding='utf-8') as json_file:
-            rename = json.load(json_file)
+profiler = Profiler()
+
+
+def parse_platform(platform, parser, pool=None):
+    with profiler.stage('parse', platform=platform) as record:
+        df_msg = parser(pool=pool)
+        record['messages'] = len(df_msg)
+    return df_msg
 
-    nlp = None
-    if args.language == 'italian':
-        nlp = spacy.load("it_core_news_sm")
-    elif args.language == 'english':
-        nlp = spacy.load("en_core_news_sm")
 
-    raw_msg = []
+def parse():
+    cache = MessageCache(args.output) if args.cache else None
+    # the parsers skip what falls out of the dates, until is included
+    until = args.until + timedelta(days=1) if args.until is not None else None
+    window = {'since': args.since, 'until': until}
+
+    parsers = {}
     if args.whatsapp:
-        raw_msg += whatsapp_parser(args.whatsapp)
+        parsers['whatsapp'] = partial(whatsapp_parser, args.whatsapp, cache=cache, engine=args.whatsapp_engine,
+                                      **window)
     if args.telegram:
-        raw_msg += telegram_parser(args.telegram)
+        parsers['telegram'] = partial(telegram_parser, args.telegram, cache=cache, engine=args.telegram_engine,
+                                      **window)
     if args.instagram:
-        raw_msg += instagram_parser(args.instagram, args.myself)
+        parsers['instagram'] = partial(instagram_parser, args.instagram, args.myself, cache=cache,
+                                       engine=args.instagram_engine, **window)
     if args.skype:
-        raw_msg += skype_parser(args.skype, args.myself, '../resources/skype_emoticons.txt')
-
-    selection = set(args.selection).union({args.myself})
+        parsers['skype'] = partial(skype_parser, args.skype, args.myself, '../resources/skype_emoticons.txt',
+                                   cache=cache, stream=args.skype_stream, **window)
 
-    for msg in raw_msg:
-        if msg['conv'] in rename.keys():
-            msg['conv'] = rename[msg['conv']]
-        if msg['user'] in rename.keys():
-            msg['user'] = rename[msg['user']]
+    if args.jobs <= 1 or len(parsers) == 0:
+        df_msg = concat([parse_platform(x, parser) for x, parser in parsers.items()])
+    else:
+        # workers are forked by Pool() before any parser thread starts
+        with Pool(args.jobs) as pool, ThreadPoolExecutor(len(parsers)) as threads:
+            results = [threads.submit(parse_platform, x, parser, pool) for x, parser in parsers.items()]
+            df_msg = concat([result.result() for result in results])
 
-    users = set()
-    for msg in raw_msg:
-        users.add(msg['user'])
+    if cache is not None:
+        cache.save()
+    return df_msg
 
-    if args.myself not in users:
-        raise Exception(str(args.myself) + ' is not present')
 
-    df_msg = pd.DataFrame(raw_msg)
-    df_msg['date'] = df_msg['datetime'].dt.date
-    df_msg = df_msg[~df_msg['text'].isnull()]
+def memory_report(df_msg):
+    # content must hold plain text, parser objects left there would keep whole documents alive
+    print('Memory usage per message')
+    for social, msgs in df_msg.groupby('social', observed=True):
+        usage = msgs.memory_usage(index=False, deep=True)
+        objects = (~msgs['content'].map(lambda x: x is None or isinstance(x, str))).sum()
+        print('{0}\t{1} messages\t{2:.0f} bytes\t{3:.0f} bytes of content\t{4} not text'.format(
+            social, len(msgs), usage.sum() / len(msgs), usage['content'] / len(msgs), objects))
 
-    df_msg['words'] = df_msg['text'].apply(
-        lambda x: len(re.split(r'[\s]+', x)) if x not in TO_SKIP else 0)
 
-    first_year = df_msg['datetime'].sort_values().iloc[0].year
+def fingerprints(df_msg, users, names, first_year):
+    # everything a report is drawn from: the messages of the user, those of the chat with them and the parameters.
+    # myself and the selection decide which chats the senders and receivers charts are drawn from
+    params = json.dumps([args.language, names, args.renderer, args.pdf_compression, args.pdf_quality, first_year,
+                         args.word_counters, args.myself, sorted(set(args.selection).union({args.myself}))],
+                        sort_keys=True).encode('utf-8')
+    rows = pd.util.hash_pandas_object(df_msg[['datetime', 'user', 'conv', 'social', 'group', 'text']],
+                                      index=False).values
+    owners = df_msg.groupby('user', observed=True).indices
+    convs = df_msg.groupby('conv', observed=True).indices
 
-    if len(selection) > 1:
-        df_msg = df_msg[df_msg['user'].isin(selection)]
+    prints = {}
+    for user in users:
+        if user == args.myself:
+            idx = np.arange(len(df_msg))
+        else:
+            idx = np.union1d(owners.get(user, []), convs.get(user, [])).astype(np.int64)
+        digest = hashlib.sha1(params)
+        digest.update(rows[idx].tobytes())
+        prints[user] = {'messages': len(idx), 'last': str(df_msg['datetime'].values[idx].max()),
+                        'language': args.language, 'hash': digest.hexdigest()}
+    return prints
 
-    single_convs = df_msg[df_msg['conv'].isin(selection)]
-    single_convs = single_convs[~single_convs['group']]
-    convs = single_convs.groupby('conv')
 
-    for user, user_msg in tqdm(df_msg.groupby('user'), desc='Plot'):
-        slides = []
-        conv = convs.get_group(user) if user != args.myself else single_convs
-        msgs = user_msg if user != args.myself else df_msg
-        analyzer = Analyzer(args, user, msgs, conv, first_year, nlp)
+def init_report(args, df_msg, index, first_year, now):
+    # runs once per worker: fonts are loaded with drawings, tokens are already in df_msg and counts in index
+    global report_state
+    report_state = {'args': args, 'df_msg': df_msg, 'index': index, 'first_year': first_year, 'now': now,
+                    'users': df_msg.groupby('user', observed=True).indices}
 
-        data = analyzer.stats()
-        slides.append(draw_stats(data))
 
-        plot = analyzer.plot_daily_count()
-        slides.append(draw_daily(data, plot))
+def report(user):
+    args = report_state['args']
+    df_msg = report_state['df_msg']
 
-        plot_msg = analyzer.plot_senders_receivers()
-        plot_hour = analyzer.plot_hour_activity()
-        slides.append(draw_activity(plot_msg, plot_hour))
+    msgs = df_msg.iloc[report_state['users'][user]] if user != args.myself else df_msg
+    analyzer = Analyzer(args, user, msgs, report_state['index'], report_state['first_year'], report_state['now'])
+    # every chart, slide and page is a stage of its own, the records go back to the main process
+    profiler = Profiler(args.profile, args.profile_stage, args.output, user=user, messages=len(msgs))
+    timed = profiler.call
 
-        plot_emo = analyzer.plot_emoji()
-        plot_word = analyzer.plot_wordcloud()
-        slides.append(draw_most_used(plot_word, plot_emo))
+    # each slide goes to the pdf as soon as it is drawn
+    path = os.path.join(args.output, user + '.pdf')
+    with PdfReport(path, args.pdf_compression, args.pdf_quality) as pdf:
+        add = partial(timed, pdf.add)
+        data = timed(analyzer.stats)
+        add(timed(draw_stats, data))
+        add(timed(draw_daily, data, timed(analyzer.plot_daily_count)))
+        add(timed(draw_activity, timed(analyzer.plot_senders_receivers), timed(analyzer.plot_hour_activity)))
+        add(timed(draw_most_used, timed(analyzer.plot_wordcloud), timed(analyzer.plot_emoji)))
 
         if user == args.myself:
-            plot_usr = analyzer.plot_users()
-            slides.append(draw_users(plot_usr))
+            add(timed(draw_users, timed(analyzer.plot_users)))
 
-            img1, img2 = analyzer.plot_comparison()
-            slides.append(draw_final_hist(img1))
-            slides.append(draw_final_hist(img2))
+            img1, img2 = timed(analyzer.plot_comparison)
+            add(timed(draw_final_hist, img1))
+            add(timed(draw_final_hist, img2))
 
-        path = os.path.join(args.output, user + '.pdf')
-        slides[0].save(path, save_all=True, append_images=slides[1:])
+    return path, profiler.records
 
 
-if __name__ == "__main__":
-    print('Chat Analysis')
+def load(names):
+    # parsed, renamed and filtered messages, as every report reads them
+    df_msg = parse()
+
+    with profiler.stage('messages') as record:
+        selection = set(args.selection).union({args.myself})
+
+        df_msg['conv'] = rename(df_msg['conv'], names)
+        df_msg['user'] = rename(df_msg['user'], names)
+
+        # filtered units keep the categories of the messages they dropped, myself must have messages left
+        if not (df_msg['user'] == args.myself).any():
+            raise Exception(str(args.myself) + ' is not present')
+
+        if args.memory:
+            memory_report(df_msg)
+
+        df_msg = enrich(df_msg)
+        df_msg = df_msg[df_msg['kind'] != 'deleted']
+
+        first_year = df_msg['datetime'].sort_values().iloc[0].year
+
+        if len(selection) > 1:
+            df_msg = df_msg[df_msg['user'].isin(selection)]
+
+        df_msg = df_msg.assign(user=compact(df_msg['user']), conv=compact(df_msg['conv']),
+                               social=compact(df_msg['social']))
+        record['messages'] = len(df_msg)
+    return df_msg, first_year
+
 
+def draw_reports():
+    names = dict()
+    if args.rename:
+        with open(args.rename, 'r', encoding='utf-8') as json_file:
+            names = json.load(json_file)
+
+    df_msg, first_year = load(names)
+    selection = set(args.selection).union({args.myself})
+
+    users = sorted(df_msg['user'].cat.categories)
+    with profiler.stage('fingerprints', messages=len(df_msg)):
+        prints = fingerprints(df_msg, users, names, first_year)
+    manifest_file = os.path.join(args.output, 'manifest.json')
+    manifest = {}
+    if os.path.exists(manifest_file):
+        with open(manifest_file, 'r', encoding='utf-8') as json_file:
+            manifest = json.load(json_file)
+
+    # reports whose messages and parameters did not change are kept
+    users = [x for x in users if args.force or manifest.get(x) != prints[x]
+             or not os.path.exists(os.path.join(args.output, x + '.pdf'))]
+    print('{0} reports to draw, {1} up to date'.format(len(users), len(prints) - len(users)))
+    if len(users) == 0:
+        return
+
+    # the language model is only needed by the word clouds of the reports to draw
+    nlp = None
+    with profiler.stage('nlp'):
+        import spacy
+        if args.language == 'italian':
+            nlp = spacy.load("it_core_news_sm")
+        elif args.language == 'english':
+            nlp = spacy.load("en_core_news_sm")
+
+    cache_dir = args.output if args.token_cache else None
+    # media and links have no words, only the messages of the reports to draw are tokenized
+    is_text = (df_msg['kind'] == 'text').values
+    if args.myself not in users:
+        is_text &= df_msg['user'].isin(users).values
+    tokens = np.full(len(df_msg), '', dtype=object)
+    with profiler.stage('tokenize', messages=int(is_text.sum())):
+        tokens[is_text] = tokenize(df_msg['text'].values[is_text], nlp, args.nlp_batch_size, args.nlp_jobs,
+                                   cache_dir)
+    df_msg['tokens'] = tokens
+
+    single_convs = df_msg[df_msg['conv'].isin(selection)]
+    single_convs = single_convs[~single_convs['group']]
+    with profiler.stage('index', messages=len(df_msg)):
+        index = MessageIndex(df_msg, single_convs, args.word_counters)
+
+    state = (args, df_msg, index, first_year, datetime.now())
+    if args.plot_jobs <= 1:
+        init_report(*state)
+        for user in tqdm(users, desc='Plot'):
+            profiler.records += report(user)[1]
+    else:
+        with Pool(args.plot_jobs, initializer=init_report, initargs=state) as pool:
+            for _, records in tqdm(pool.imap_unordered(report, users), total=len(users), desc='Plot'):
+                profiler.records += records
+
+    manifest.update({x: prints[x] for x in users})
+    with open(manifest_file, 'w', encoding='utf-8') as json_file:
+        json.dump(manifest, json_file, indent=1)
+
+
+def run():
+    global profiler
+    profiler = Profiler(args.profile, args.profile_stage, args.output)
+    start = time.perf_counter()
+    try:
+        draw_reports()
+    finally:
+        if args.profile:
+            profiler.save(os.path.join(args.output, 'profile.json'), time.perf_counter() - start)
+
+
+def arguments():
     parser = argparse.ArgumentParser()
     parser.add_argument('-r', '--rename', type=str, help='rename dictionary')
     parser.add_argument('-l', '--language', type=str, help='language', choices=['italian', 'english'],
                         default='italian')
     parser.add_argument('-m', '--myself', type=str, help='own username', required=True)
     parser.add_argument('-o', '--output', type=str, help='output folder', default='../output/')
+    parser.add_argument('--since', type=datetime.fromisoformat, help='first day of the messages, as 2021-01-31')
+    parser.add_argument('--until', type=datetime.fromisoformat, help='last day of the messages, as 2021-12-31')
+    parser.add_argument('-j', '--jobs', type=int, help='parallel ingestion processes', default=1)
+    parser.add_argument('--plot-jobs', type=int, help='parallel report processes', default=1)
+    parser.add_argument('--renderer', type=str, help='chart renderer', choices=['plotly', 'matplotlib'],
+                        default='plotly')
+    parser.add_argument('--pdf-compression', type=str, help='compression of the report pages',
+                        choices=['jpeg', 'flate'], default='jpeg')
+    parser.add_argument('--pdf-quality', type=int, help='jpeg quality of the report pages', default=75)
+    parser.add_argument('--nlp-batch-size', type=int, help='messages per spaCy batch', default=1000)
+    parser.add_argument('--nlp-jobs', type=int, help='spaCy tokenization processes', default=1)
+    parser.add_argument('--word-counters', type=int, help='words counted per user for the word clouds, all by default')
+    parser.add_argument('--cache', action='store_true', help='keep parsed messages in the output folder')
+    parser.add_argument('--token-cache', action='store_true', help='keep spaCy tokens in the output folder')
+    parser.add_argument('--force', action='store_true', help='draw again the reports that are up to date')
+    parser.add_argument('--memory', action='store_true', help='report memory used by the messages of each platform')
+    parser.add_argument('--profile', action='store_true', help='write time and memory of each stage to profile.json')
+    parser.add_argument('--profile-stage', type=str, help='dump cProfile stats of a stage, as Analyzer.plot_emoji')
     parser.add_argument('--instagram', type=str, help='instagram input folder')
+    parser.add_argument('--instagram-engine', type=str, help='instagram parser', choices=['vectorized', 'python'],
+                        default='vectorized')
     parser.add_argument('--skype', type=str, help='skype input folder')
+    parser.add_argument('--skype-stream', action='store_true', help='read skype messages one at a time')
     parser.add_argument('--telegram', type=str, help='telegram input folder')
+    parser.add_argument('--telegram-engine', type=str, help='telegram parser', choices=['lxml', 'bs4'], default='lxml')
     parser.add_argument('--whatsapp', type=str, help='whatsapp input folder')
+    parser.add_argument('--whatsapp-engine', type=str, help='whatsapp parser', choices=['vectorized', 'python'],
+                        default='vectorized')
     parser.add_argument('selection', type=str, help='users selection', nargs='*')
+    return parser
+
+
+if __name__ == "__main__":
+    print('Chat Analysis')
 
-    args = parser.parse_args()
+    args = arguments().parse_args()
 
     run()
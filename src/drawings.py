@@ -1,22 +1,23 @@
+from functools import lru_cache
 from PIL import Image, ImageDraw, ImageFont
 
-font_title = ImageFont.truetype('../resources/Calibri Light.ttf', 70)
-font_section = ImageFont.truetype('../resources/Calibri Regular.ttf', 40)
-font_bold = ImageFont.truetype('../resources/Calibri Bold.ttf', 30)
-font_number = ImageFont.truetype('../resources/Calibri Regular.ttf', 30)
-font_italic = ImageFont.truetype('../resources/Calibri Italic.ttf', 30)
+FONTS = {'title': ('Calibri Light.ttf', 70), 'section': ('Calibri Regular.ttf', 40), 'bold': ('Calibri Bold.TTF', 30),
+         'number': ('Calibri Regular.ttf', 30), 'italic': ('Calibri Italic.ttf', 30)}
+
+# pixel size of each chart on its slide
+SIZES = {'users': (700, 500), 'final_hist': (1400, 1000), 'wordcloud': (900, 720), 'emoji': (700, 480),
+         'senders_receivers': (820, 640), 'hour': (800, 580), 'daily': (1400, 1000)}
 
 
 def draw_users(plot):
     img = Image.new(mode="RGB", size=(2000, 1024), color=(255, 255, 255))
-    plot = Image.open(plot)
     img.paste(plot, (650, 200))
     return img
 
 
 def draw_final_hist(plot):
     img = Image.new(mode="RGB", size=(2000, 1024), color=(255, 255, 255))
-    plot = Image.open(plot).resize((1400, 1000))
+    plot = _fit(plot, SIZES['final_hist'])
     img.paste(plot, (280, 30))
     return img
 
@@ -25,13 +26,13 @@ def draw_most_used(plot_word, plot_emo):
     img = Image.new(mode="RGB", size=(2000, 1024), color=(255, 255, 255))
     d = ImageDraw.Draw(img)
 
-    plt1 = Image.open(plot_word).resize((900, 720))
+    plt1 = _fit(plot_word, SIZES['wordcloud'])
     img.paste(plt1, (160, 100))
-    d.text((600, 900), '100 most used words', font=font_italic, font_size=30, anchor="mm", fill=(0, 0, 0))
+    d.text((600, 900), '100 most used words', font=_font('italic'), font_size=30, anchor="mm", fill=(0, 0, 0))
 
-    plt2 = Image.open(plot_emo).resize((700, 480))
+    plt2 = _fit(plot_emo, SIZES['emoji'])
     img.paste(plt2, (1100, 210))
-    d.text((1420, 900), '10 most used emojis', font=font_italic, font_size=30, anchor="mm", fill=(0, 0, 0))
+    d.text((1420, 900), '10 most used emojis', font=_font('italic'), font_size=30, anchor="mm", fill=(0, 0, 0))
 
     return img
 
@@ -40,20 +41,20 @@ def draw_activity(plot_msg, plot_hour):
     img = Image.new(mode="RGB", size=(2000, 1024), color=(255, 255, 255))
     d = ImageDraw.Draw(img)
 
-    plt1 = Image.open(plot_msg).resize((820, 640))
+    plt1 = _fit(plot_msg, SIZES['senders_receivers'])
     img.paste(plt1, (200, 160))
-    d.text((600, 900), 'Messages received/sent', font=font_italic, font_size=30, anchor="mm", fill=(0, 0, 0))
+    d.text((600, 900), 'Messages received/sent', font=_font('italic'), font_size=30, anchor="mm", fill=(0, 0, 0))
 
-    plt2 = Image.open(plot_hour).resize((800, 580))
+    plt2 = _fit(plot_hour, SIZES['hour'])
     img.paste(plt2, (1100, 160))
-    d.text((1500, 900), 'Activities by time of  day', font=font_italic, font_size=30, anchor="mm", fill=(0, 0, 0))
+    d.text((1500, 900), 'Activities by time of  day', font=_font('italic'), font_size=30, anchor="mm", fill=(0, 0, 0))
 
     return img
 
 
 def draw_daily(data, plot):
     img = Image.new(mode="RGB", size=(2000, 1024), color=(255, 255, 255))
-    plot = Image.open(plot).resize((1400, 1000))
+    plot = _fit(plot, SIZES['daily'])
     img.paste(plot, (300, 30))
     d = ImageDraw.Draw(img, 'RGBA')
 
@@ -71,7 +72,7 @@ def draw_daily(data, plot):
 def draw_stats(data):
     img = Image.new(mode="RGB", size=(2000, 1024), color=(255, 255, 255))
     d = ImageDraw.Draw(img)
-    d.text((1000, 100), data['user'], font=font_title, anchor="ms", fill=(100, 100, 100))
+    d.text((1000, 100), data['user'], font=_font('title'), anchor="ms", fill=(100, 100, 100))
 
     _draw_section(d, 170, 'TOTAL DAYS', f'{data["tot_days"]:,}')
     _draw_section(d, 310, 'TOTAL MESSAGES', f'{data["tot_msg"]:,}')
@@ -89,9 +90,21 @@ def draw_stats(data):
     return img
 
 
+@lru_cache(maxsize=None)
+def _font(name):
+    # loaded by the first slide that uses them
+    file, size = FONTS[name]
+    return ImageFont.truetype('../resources/' + file, size)
+
+
+def _fit(plot, size):
+    # charts drawn at the size of the slide are pasted as they are
+    return plot if plot.size == size else plot.resize(size)
+
+
 def _draw_section(d, top, title, text, line=True):
-    d.text((60, top), title, font=font_section, fill=(100, 100, 100))
-    d.text((60, top + 50), text, font=font_section, font_size=50, fill=(0, 0, 0))
+    d.text((60, top), title, font=_font('section'), fill=(100, 100, 100))
+    d.text((60, top + 50), text, font=_font('section'), font_size=50, fill=(0, 0, 0))
     if line:
         d.line((60, top + 120, 1000, top + 120), fill=(120, 120, 120), width=5)
 
@@ -99,10 +112,10 @@ def _draw_section(d, top, title, text, line=True):
 def _draw_socials(d, img, top, logo, text):
     logo_whatsapp = Image.open(logo)
     img.paste(logo_whatsapp, (1700, top), logo_whatsapp)
-    d.text((1800, top + 18), text, anchor="lt", font=font_section, font_size=30, fill=(0, 0, 0))
+    d.text((1800, top + 18), text, anchor="lt", font=_font('section'), font_size=30, fill=(0, 0, 0))
 
 
 def _draw_row(d, top, label, text, color):
     d.rectangle([1100, top, 1650, top + 60], fill=(color, color, color, 32), outline=None)
-    d.text((1105, top + 30), label, font=font_bold, font_size=30, anchor="lm", fill=(0, 0, 0, 255))
-    d.text((1400, top + 30), text, font=font_number, anchor="lm", fill=(0, 0, 0, 255))
+    d.text((1105, top + 30), label, font=_font('bold'), font_size=30, anchor="lm", fill=(0, 0, 0, 255))
+    d.text((1400, top + 30), text, font=_font('number'), anchor="lm", fill=(0, 0, 0, 255))
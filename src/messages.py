@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+COLUMNS = ['datetime', 'user', 'group', 'content', 'text', 'conv', 'social']
+
+CATEGORIES = ['user', 'conv', 'social']
+
+KINDS = ['text', 'media', 'link', 'deleted']
+
+MARKERS = {'$$media_omitted$$': 'media', '$$link$$': 'link'}
+
+WORDS_CHUNK = 100000
+
+# the last blank code point is U+3000, the ones above are not checked one by one
+SPACES = np.zeros(0x110000, dtype=bool)
+SPACES[[x for x in range(0x3001) if chr(x).isspace()]] = True
+
+
+def categorical(values):
+    # categories in order of appearance
+    codes, categories = pd.factorize(np.asarray(values, dtype=object))
+    return pd.Categorical.from_codes(codes, categories)
+
+
+def _constant(value, n):
+    if value is None:
+        return pd.Categorical.from_codes(np.full(n, -1, dtype=np.int8), [])
+    return pd.Categorical.from_codes(np.zeros(n, dtype=np.int8), [value])
+
+
+def from_columns(dates, users, contents, texts, group, conv, social):
+    # the columns of a parsed file, page or conversation, group, conv and social are shared by all its messages
+    n = len(dates)
+    return {'datetime': pd.to_datetime(dates).values, 'user': categorical(users),
+            'group': np.full(n, group, dtype=bool), 'content': np.array(contents, dtype=object),
+            'text': np.array(texts, dtype=object), 'conv': _constant(conv, n), 'social': _constant(social, n)}
+
+
+def from_rows(rows, group, conv, social):
+    # rows are (datetime, user, content, text)
+    return from_columns(*[[row[i] for row in rows] for i in range(4)], group, conv, social)
+
+
+def between(unit, since=None, until=None):
+    # the messages of a unit from since, included, to until, excluded
+    if since is None and until is None:
+        return unit
+    keep = np.ones(len(unit['datetime']), dtype=bool)
+    if since is not None:
+        keep &= unit['datetime'] >= np.datetime64(since)
+    if until is not None:
+        keep &= unit['datetime'] < np.datetime64(until)
+    return unit if keep.all() else {x: unit[x][keep] for x in COLUMNS}
+
+
+def concat(units):
+    # units are column dicts or message tables, the result is a single message table
+    if len(units) == 0:
+        units = [from_rows([], False, None, None)]
+
+    data = {}
+    for column in COLUMNS:
+        values = [x[column] for x in units]
+        data[column] = union_categoricals(values) if column in CATEGORIES else np.concatenate(values)
+    return pd.DataFrame(data, columns=COLUMNS)
+
+
+def rename(column, names):
+    # categories are renamed once, those ending up with the same name are merged
+    codes, categories = pd.factorize(np.asarray([names.get(x, x) for x in column.cat.categories], dtype=object))
+    codes = np.append(codes, -1)
+    return pd.Categorical.from_codes(codes[column.cat.codes], categories)
+
+
+def compact(column):
+    # drops the categories left without messages, the others are sorted and ordered so that
+    # groupby lists them as it does plain strings
+    codes = pd.unique(column.cat.codes)
+    return column.cat.set_categories(sorted(column.cat.categories[codes[codes >= 0]]), ordered=True)
+
+
+def count_words(texts):
+    # same count as len(re.split(r'[\s]+', text)): one word more than the runs of blanks. The runs are found on the
+    # code points of a chunk of messages joined by a non blank separator
+    counts = []
+    for first in range(0, len(texts), WORDS_CHUNK):
+        chunk = texts[first:first + WORDS_CHUNK]
+        joined = '\x00'.join(chunk)
+        blanks = SPACES[np.frombuffer(joined.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)]
+        # a trailing empty message starts at the end of the chunk, the padding keeps its start in bounds
+        runs = np.concatenate((blanks & ~np.concatenate(([False], blanks[:-1])), [False]))
+        lengths = np.fromiter(map(len, chunk), dtype=np.int64, count=len(chunk)) + 1
+        starts = np.cumsum(lengths) - lengths
+        counts.append(np.add.reduceat(runs.astype(np.int64), starts) + 1)
+    return np.concatenate(counts) if len(counts) > 0 else np.zeros(0, dtype=np.int64)
+
+
+def enrich(df_msg):
+    # computed once after loading: the kind of each message and the words of the textual ones
+    codes = np.zeros(len(df_msg), dtype=np.int8)
+    codes[df_msg['text'].isnull().values] = KINDS.index('deleted')
+    for marker, kind in MARKERS.items():
+        codes[(df_msg['text'] == marker).values] = KINDS.index(kind)
+
+    words = np.zeros(len(df_msg), dtype=np.int64)
+    is_text = codes == KINDS.index('text')
+    words[is_text] = count_words(df_msg['text'].values[is_text].tolist())
+    return df_msg.assign(words=words, kind=pd.Categorical.from_codes(codes, KINDS))
@@ -1,12 +1,30 @@
 import os
 from datetime import datetime, timedelta
 import re
+from functools import partial
+from collections import deque
 from pathlib import Path
+import time
+import hashlib
+import numpy as np
 from bs4 import BeautifulSoup
+from lxml import etree
 import json
 import html
 from tqdm import tqdm
 
+from messages import COLUMNS, from_columns, from_rows, concat, between
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 PATTERN_DELETED = {'en': {'you deleted this message', 'this message was deleted'},
                    'it': {'hai eliminato questo messaggio', 'questo messaggio è stato eliminato'}
                    }
@@ -21,6 +39,36 @@ WHATSAPP_TRIGGER_WORDS = {'en': 'with', 'it': 'con'}
 
 DETECT_LANG = {'WhatsApp Chat with': 'en', 'Chat WhatsApp con': 'it'}
 
+WHATSAPP_LINE = re.compile(r'([\d]+/[\d]+/[\d]+),\s([\d]+:[\d]+)\s-\s(.*)')
+
+WHATSAPP_BULK = re.compile(r'^(?:([\d]+)/([\d]+)/([\d]+),[^\S\n]([\d]+):[\d]+[^\S\n]-[^\S\n])?(.*)$', re.MULTILINE)
+
+DAYS_IN_MONTH = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+# years that fit in the datetime64 column of the message table
+YEARS = (1678, 2261)
+
+LINK_START = re.compile(r'^(https://|http://|www.)', re.MULTILINE)
+
+AMPERSAND = re.compile('&')
+
+TELEGRAM_DAY = re.compile(r'class="pull_right date details" title="([\d]+)\.([\d]+)\.([\d]+)')
+
+TELEGRAM_DATE = re.compile(r'([\d]+).([\d]+).([\d]+)\s([\d]+):([\d]+):([\d]+)')
+
+SKYPE_DATE = re.compile(r'([\d]+)-([\d]+)-([\d]+)T([\d]+):([\d]+):([\d]+)')
+
+# text the html parser keeps as it is, it cannot start with blanks and has no markup, entities or control characters
+SKYPE_PLAIN = re.compile(r'[^\s<&\x00-\x1f\x7f\ufeff\ufffe\uffff][^<&\x00-\x08\x0b\x0c\x0e-\x1f\x7f\ufeff\ufffe\uffff]*')
+
+SKYPE_CHUNK = 5000
+
+# links at the start of a message, in messages preceded by \x00
+INSTAGRAM_LINK = re.compile('\x00(https://|http://|www.)')
+
+# the characters str.splitlines breaks lines on, \r\n is a single break
+LINE_BREAKS = '\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029'
+
 
 def _filter_text(text, source=None, lang=None):
     filtered = text
@@ -72,216 +120,808 @@ def _parse_skype(content, emoji_map):
     return ''
 
 
-def whatsapp_parser(path):
-    messages = []
+def _map(func, items, pool=None):
+    if pool is None:
+        return list(map(func, items))
+    return pool.map(func, items)
+
+
+def _source(file, *extra):
+    stat = os.stat(file)
+    return str(file), [stat.st_size, stat.st_mtime_ns, *extra]
+
+
+def _window(since, until):
+    # units parsed within a date range are cached apart from the whole ones
+    return [] if since is None and until is None else [str(since), str(until)]
+
+
+def _overlaps(first, last, since, until):
+    # whether messages from day first to day last can fall in [since, until)
+    return (since is None or last >= since.date()) and (until is None or first < until.date())
+
+
+def _parse_between(parse, since, until, unit):
+    return between(parse(unit), since, until)
+
+
+def _parse_units(func, units, desc, pool=None, cache=None, sources=None):
+    cached = [None] * len(units) if cache is None else [cache.get(*x) for x in sources]
+    todo = [unit for unit, columns in zip(units, cached) if columns is None]
+    results = map(func, todo) if pool is None else pool.imap(func, todo)
+
+    for i in tqdm(range(len(units)), desc=desc):
+        if cached[i] is None:
+            cached[i] = next(results)
+            if cache is not None:
+                cache.put(*sources[i], cached[i])
+    return concat(cached)
+
+
+def _parse_resumable(func, units, desc, pool=None, cache=None, sources=None):
+    # func gets each unit that changed with its checkpoint, and returns the messages that follow the first kept ones
+    # of the cached unit, with the checkpoint of the new unit
+    cached = [cache.get(*x) for x in sources]
+    todo = [(unit, cache.checkpoint(x[0])) for unit, x, columns in zip(units, sources, cached) if columns is None]
+    results = map(func, todo) if pool is None else pool.imap(func, todo)
+
+    for i in tqdm(range(len(units)), desc=desc):
+        if cached[i] is None:
+            columns, kept, checkpoint = next(results)
+            if kept > 0:
+                previous = cache.units[sources[i][0]]
+                columns = concat([{x: previous[x][:kept] for x in COLUMNS}, columns])
+                columns = {x: columns[x].values for x in COLUMNS}
+            cached[i] = columns
+            cache.put(*sources[i], columns, checkpoint)
+    return concat(cached)
+
+
+def _parse_stream(func, units, desc, pool=None, window=16):
+    # at most window units are queued to the workers, so that the generator is not read ahead of them
+    results = []
+    pending = deque()
+    for unit in tqdm(units, desc=desc):
+        if pool is None:
+            results.append(func(unit))
+            continue
+        pending.append(pool.apply_async(func, (unit,)))
+        if len(pending) >= window:
+            results.append(pending.popleft().get())
+
+    while len(pending) > 0:
+        results.append(pending.popleft().get())
+    return concat(results)
+
+
+def whatsapp_parser(path, pool=None, cache=None, engine='vectorized', since=None, until=None):
     files = list(Path(path).glob('*.txt'))
-    for file in tqdm(files, desc='Whatsapp'):
+    sources = [_source(file, *_window(since, until)) for file in files] if cache is not None else None
+    parse = _parse_whatsapp_file_vectorized if engine == 'vectorized' else _parse_whatsapp_file
+    if since is not None or until is not None:
+        parse = partial(_parse_whatsapp_between, parse, since, until)
+    elif cache is not None:
+        # chats are exported again with new lines at the end, the cached ones are only parsed from where they grew
+        parse_lines = _parse_whatsapp_lines_vectorized if engine == 'vectorized' else _parse_whatsapp_lines
+        parse = partial(_parse_whatsapp_resumable, parse, parse_lines)
+        return _parse_resumable(parse, files, 'Whatsapp', pool, cache, sources)
+    return _parse_units(parse, files, 'Whatsapp', pool, cache, sources)
+
+
+def _whatsapp_day(line, lang):
+    header = WHATSAPP_LINE.match(line)
+    if header is None:
+        return None
+    first, second, year = header.group(1).split('/')
+    month, day = (first, second) if lang == 'en' else (second, first)
+    return datetime(int('20' + year), int(month), int(day)).date()
+
+
+def _parse_whatsapp_between(parse, since, until, file):
+    # chats are in chronological order, those whose first and last messages are out of the range are not parsed
+    try:
+        lines = file.read_text(encoding='utf-8').splitlines()
+        lang, is_group, conv_usr = _whatsapp_metadata(file, lines)
+        first = next(x for x in map(partial(_whatsapp_day, lang=lang), lines) if x is not None)
+        last = next(x for x in map(partial(_whatsapp_day, lang=lang), reversed(lines)) if x is not None)
+        if not _overlaps(first, last, since, until):
+            return from_rows([], is_group, conv_usr, 'whatsapp')
+    except Exception:
+        pass
+    return between(parse(file), since, until)
+
+
+def _whatsapp_start(line, lang):
+    # whether a line starts a message, as both parsers read it
+    header = WHATSAPP_LINE.match(line)
+    if header is None or ': ' not in header.group(3):
+        return False
+    try:
+        year = _whatsapp_day(line, lang).year
+    except (ValueError, OverflowError):
+        return False
+    return int(header.group(2).split(':')[0]) <= 23 and YEARS[0] <= year <= YEARS[1]
+
+
+def _line_start(text, lines, i):
+    # position of lines[i] in text, walking back from the end over the lines after it and their breaks
+    position = len(text)
+    for line in reversed(lines[i:]):
+        if text.endswith('\r\n', 0, position):
+            position -= 2
+        elif position > 0 and text[position - 1] in LINE_BREAKS:
+            position -= 1
+        position -= len(line)
+    return position
+
+
+def _parse_whatsapp_resumable(parse, parse_lines, unit):
+    # a chat is parsed from the line of the last message it had at its checkpoint, so that lines appended to that
+    # message are still folded into it. Chats whose bytes before that line changed are parsed again from the start
+    file, checkpoint = unit
+    try:
+        raw = file.read_bytes()
+        offset = 0 if checkpoint is None else checkpoint['offset']
+        digest = hashlib.blake2b(raw[:offset])
+        if checkpoint is not None and digest.hexdigest() != checkpoint['digest']:
+            checkpoint, offset, digest = None, 0, hashlib.blake2b()
+
+        text = raw[offset:].decode('utf-8')
+        lines = text.splitlines()
+        if checkpoint is None:
+            lang, is_group, conv_usr = _whatsapp_metadata(file, lines)
+            first_line, kept = 0, 0
+        else:
+            lang, is_group, conv_usr, first_line, kept = [checkpoint[x] for x in ['lang', 'group', 'conv', 'line',
+                                                                                  'messages']]
+        columns = parse_lines(file, lines, lang, is_group, conv_usr, first_line)
+    except Exception:
+        # errors are reported by the parser of the whole file
+        return parse(file), 0, None
+
+    # the group of a chat is read from its first two lines, they are always before the checkpoint
+    last = next((i for i in range(len(lines) - 1, -1, -1) if _whatsapp_start(lines[i], lang)), None)
+    if last is None or first_line + last < 2:
+        return columns, kept, None
+
+    end = len(raw) - len(text[_line_start(text, lines, last):].encode('utf-8'))
+    digest.update(raw[offset:end])
+    checkpoint = {'offset': end, 'digest': digest.hexdigest(), 'lang': lang, 'group': is_group, 'conv': conv_usr,
+                  'line': first_line + last, 'messages': kept + len(columns['datetime']) - 1}
+    return columns, kept, checkpoint
+
+
+def _whatsapp_metadata(file, lines):
+    txt = file.name.split('.')[0]
+    lang = None
+    for k, v in DETECT_LANG.items():
+        if k in txt:
+            lang = v
+            break
+    if lang is None:
+        raise Exception('cannot detect language')
+
+    is_group = PATTERN_GROUP[lang] in lines[0] or PATTERN_GROUP[lang] in lines[1]
+    conv_usr = None if is_group else file.name.split(WHATSAPP_TRIGGER_WORDS[lang])[-1].strip().split('.')[0]
+    return lang, is_group, conv_usr
+
+
+def _parse_whatsapp_file(file):
+    is_group, conv_usr = False, None
+    try:
+        lines = list(file.read_text(encoding='utf-8').splitlines())
+        lang, is_group, conv_usr = _whatsapp_metadata(file, lines)
+        return _parse_whatsapp_lines(file, lines, lang, is_group, conv_usr)
+
+    except Exception as e:
+        print('Error while parsing {0}\t{1}'.format(file.name, str(e)))
+
+    return from_rows([], is_group, conv_usr, 'whatsapp')
+
+
+def _parse_whatsapp_lines(file, lines, lang, is_group, conv_usr, first_line=0):
+    # first_line is the number of the first of the lines in the file, when only its tail is parsed
+    messages = []
+    for i, line in enumerate(lines, first_line):
         try:
-            lines = list(file.read_text(encoding='utf-8').splitlines())
-            txt = file.name.split('.')[0]
-            lang = None
-            for k, v in DETECT_LANG.items():
-                if k in txt:
-                    lang = v
-                    break
-            if lang is None:
-                raise Exception('cannot detect language')
-
-            is_group = PATTERN_GROUP[lang] in lines[0] or PATTERN_GROUP[lang] in lines[1]
-            conv_usr = None if is_group else file.name.split(WHATSAPP_TRIGGER_WORDS[lang])[-1].strip().split('.')[0]
-
-            for i, line in enumerate(lines):
-                try:
-                    new_msg = re.match('([\d]+/[\d]+/[\d]+),\s([\d]+:[\d]+)\s-\s(.*)', line)
-
-                    if new_msg is not None:
-                        new_msg = new_msg.groups()
-                        date_splits = new_msg[0].split('/')
-                        year = '20' + date_splits[2]
-                        time_splits = new_msg[1].split(':')
-                        if lang == 'en':
-                            date = datetime(int(year), int(date_splits[0]), int(date_splits[1]), int(time_splits[0]),
-                                            int(time_splits[0]))
-                        else:
-                            date = datetime(int(year), int(date_splits[1]), int(date_splits[0]), int(time_splits[0]),
-                                            int(time_splits[0]))
-
-                        splits = new_msg[2].split(': ', maxsplit=1)
-                        if len(splits) == 2:
-                            user = splits[0]
-                            content = splits[1].strip()
-                            text = _filter_text(content, 'whatsapp', lang)
-                            messages.append(
-                                {'datetime': date, 'user': user, 'group': is_group, 'content': content,
-                                 'text': text, 'conv': conv_usr, 'social': 'whatsapp'})
+            new_msg = WHATSAPP_LINE.match(line)
+
+            if new_msg is not None:
+                new_msg = new_msg.groups()
+                date_splits = new_msg[0].split('/')
+                year = '20' + date_splits[2]
+                time_splits = new_msg[1].split(':')
+                if lang == 'en':
+                    date = datetime(int(year), int(date_splits[0]), int(date_splits[1]), int(time_splits[0]),
+                                    int(time_splits[0]))
+                else:
+                    date = datetime(int(year), int(date_splits[1]), int(date_splits[0]), int(time_splits[0]),
+                                    int(time_splits[0]))
+
+                splits = new_msg[2].split(': ', maxsplit=1)
+                if len(splits) == 2:
+                    if not YEARS[0] <= date.year <= YEARS[1]:
+                        raise Exception('year {0} is out of range'.format(date.year))
+                    user = splits[0]
+                    content = splits[1].strip()
+                    text = _filter_text(content, 'whatsapp', lang)
+                    messages.append([date, user, content, text])
 
-                    else:
-                        content = line.strip()
-                        text = _filter_text(content, 'whatsapp', lang)
+            else:
+                content = line.strip()
+                text = _filter_text(content, 'whatsapp', lang)
+
+                last_msg = messages[-1]
+                last_msg[2] += '\n' + content
+                last_msg[3] += '\n' + text
+        except Exception as e:
+            print('Skip line {0} of {1}\t{2}'.format(i, file.name, str(e)))
+
+    return from_rows(messages, is_group, conv_usr, 'whatsapp')
+
+
+def _filter_whatsapp_texts(contents, lang):
+    # same rules as _filter_text, applied to all the lines of a file at once
+    joined = '\n'.join(contents)
+    lowered = joined.lower()
+    lowers = np.array(lowered.split('\n'), dtype=object)
+    no_dots = np.array(lowered.replace('.', '').split('\n'), dtype=object)
+
+    def lines_of(text, pattern):
+        ends = np.cumsum(np.fromiter(map(len, text.split('\n')), dtype=np.int64) + 1)
+        return np.unique(np.searchsorted(ends, [x.start() for x in pattern.finditer(text)], side='right'))
+
+    texts = np.array(contents, dtype=object)
+    escaped = lines_of(joined, AMPERSAND)
+    texts[escaped] = [html.unescape(x) for x in texts[escaped]]
+    links = lines_of(lowered, LINK_START)
+    texts[links] = '$$link$$'
+    texts[lowers == PATTERN_MEDIA[lang]] = '$$media_omitted$$'
+    for pattern in PATTERN_DELETED[lang]:
+        texts[no_dots == pattern] = None
+    return texts.tolist()
 
-                        last_msg = messages[-1]
-                        last_msg['content'] += '\n' + content
-                        last_msg['text'] += '\n' + text
-                except Exception as e:
-                    print('Skip line {0} of {1}\t{2}'.format(i, file.name, str(e)))
 
+def _parse_whatsapp_file_vectorized(file):
+    try:
+        lines = file.read_text(encoding='utf-8').splitlines()
+        lang, is_group, conv_usr = _whatsapp_metadata(file, lines)
+        return _parse_whatsapp_lines_vectorized(file, lines, lang, is_group, conv_usr)
+
+    except Exception as e:
+        print('Error while parsing {0}\t{1}'.format(file.name, str(e)))
+        return from_rows([], False, None, 'whatsapp')
+
+
+def _parse_whatsapp_lines_vectorized(file, lines, lang, is_group, conv_usr, first_line=0):
+    # one scan over all the lines, every line gives (day/month fields, year, hour, body)
+    fields = WHATSAPP_BULK.findall('\n'.join(lines))
+    if len(fields) != len(lines):
+        raise Exception('unexpected line separators')
+    first, second, years, hours, bodies = np.array(fields, dtype=object).reshape(-1, 5).T
+
+    is_header = first != ''
+    users = np.full(len(lines), None, dtype=object)
+    splits = [x.partition(': ') for x in bodies[is_header]]
+    users[is_header] = [x[0] for x in splits]
+    bodies[is_header] = [x[2] for x in splits]
+    errors = []
+
+    headers = np.flatnonzero(is_header)
+    years = ('20' + years[headers]).astype(np.int64)
+    hours = hours[headers].astype(np.int64)
+    months, days = (first, second) if lang == 'en' else (second, first)
+    months, days = months[headers].astype(np.int64), days[headers].astype(np.int64)
+
+    # check all the dates at once, datetime() is only called on invalid ones to report them
+    leap = (years % 4 == 0) & ((years % 100 != 0) | (years % 400 == 0))
+    valid = (years >= 1) & (years <= 9999) & (months >= 1) & (months <= 12) & (days >= 1) & (hours <= 23)
+    valid[valid] &= days[valid] <= DAYS_IN_MONTH[months[valid] - 1] + (leap[valid] & (months[valid] == 2))
+    for i in np.flatnonzero(~valid):
+        try:
+            datetime(years[i], months[i], days[i], hours[i], hours[i])
         except Exception as e:
-            print('Error while parsing {0}\t{1}'.format(file.name, str(e)))
+            errors.append((headers[i], str(e)))
+
+    # headers without 'user: ' are service lines, they are neither messages nor continuations
+    valid &= np.array([x[1] == ': ' for x in splits], dtype=bool)
+    in_range = (years >= YEARS[0]) & (years <= YEARS[1])
+    for i in np.flatnonzero(valid & ~in_range):
+        errors.append((headers[i], 'year {0} is out of range'.format(years[i])))
+    valid &= in_range
+
+    # minutes repeat the hour, as in the line parser
+    months = ((years[valid] - 1970) * 12 + months[valid] - 1).astype('datetime64[M]')
+    dates = months.astype('datetime64[D]') + (days[valid] - 1)
+    dates = dates.astype('datetime64[m]') + hours[valid] * 61
+
+    is_start = np.zeros(len(lines), dtype=bool)
+    is_start[headers[valid]] = True
+    group = np.cumsum(is_start)
+
+    for i in np.flatnonzero(~is_header & (group == 0)):
+        errors.append((i, 'continuation line without a message'))
+
+    contents = [x.strip() for x in bodies]
+    texts = _filter_whatsapp_texts(contents, lang)
+    starts = np.flatnonzero(is_start)
+    msg_contents = [contents[i] for i in starts.tolist()]
+    msg_texts = [texts[i] for i in starts.tolist()]
+
+    # fold continuation lines into the message they follow, only where there are any
+    nexts = np.flatnonzero(~is_header & (group > 0)).tolist()
+    for i, g in zip(nexts, group[nexts].tolist()):
+        msg_contents[g - 1] += '\n' + contents[i]
+        if texts[i] is None:
+            errors.append((i, 'deleted message marker on a continuation line'))
+        elif msg_texts[g - 1] is None:
+            errors.append((i, 'continuation line of a deleted message'))
+        else:
+            msg_texts[g - 1] += '\n' + texts[i]
+
+    for i, error in sorted(errors):
+        print('Skip line {0} of {1}\t{2}'.format(first_line + i, file.name, error))
+    return from_columns(dates, users[starts], msg_contents, msg_texts, is_group, conv_usr, 'whatsapp')
+
+
+def telegram_parser(path, pool=None, cache=None, engine='lxml', since=None, until=None):
+    folders = [os.path.join(path, x) for x in os.listdir(path) if os.path.isdir(os.path.join(path, x))]
+    metadata = _telegram_metadata_lxml if engine == 'lxml' else _telegram_metadata
+
+    pages = []
+    for filepath, meta in zip(folders, _map(metadata, folders, pool)):
+        if meta is not None:
+            is_group, conv_usr = meta
+            pages += [(file, is_group, conv_usr) for file in Path(filepath).glob('*.html')]
+
+    sources = [_source(*page, *_window(since, until)) for page in pages] if cache is not None else None
+    parse = _parse_telegram_page_lxml if engine == 'lxml' else _parse_telegram_page
+    if since is not None or until is not None:
+        parse = partial(_parse_telegram_between, parse, since, until)
+    return _parse_units(parse, pages, 'Telegram', pool, cache, sources)
+
+
+def _parse_telegram_between(parse, since, until, page):
+    # the pages without messages in the range are not parsed, the days of their messages are read from the
+    # date titles alone
+    file, is_group, conv_usr = page
+    try:
+        days = [datetime(int(y), int(m), int(d)).date()
+                for d, m, y in TELEGRAM_DAY.findall(file.read_text(encoding='utf-8'))]
+        if len(days) > 0 and not _overlaps(min(days), max(days), since, until):
+            return from_rows([], is_group, conv_usr, 'telegram')
+    except Exception:
+        pass
+    return between(parse(page), since, until)
 
-    return messages
 
+def _telegram_metadata(filepath):
+    try:
+        with open(os.path.join(filepath, 'messages.html'), 'r', encoding='utf-8') as html_file:
+            soup = BeautifulSoup(html_file, "lxml")
+            history = soup.find('div', {'class': 'history'})
+            service = history.findChildren("div", {'class': 'message service'})
+            is_group = 'group' in service[1].select_one('div').text
+
+            conv_usr = None if is_group else soup.select_one('div.page_header').find('div', {
+                'class': 'text bold'}).text.strip()
 
-def telegram_parser(path):
-    messages = []
+        return is_group, conv_usr
+    except Exception as e:
+        print('Error while parsing {0}\t{1}'.format(str(filepath), str(e)))
+        return None
 
-    files = list(Path(path).glob('./*/*.html'))
-    pbar = tqdm(total=len(files), desc='Telegram')
-    del files
 
-    for foldername in os.listdir(path):
-        filepath = os.path.join(path, foldername)
-        if os.path.isdir(filepath):
+def _parse_telegram_page(page):
+    file, is_group, conv_usr = page
+    messages = []
+    try:
+        soup = BeautifulSoup(file.read_text(encoding='utf-8'), "lxml")
+        history = soup.find('div', {'class': 'history'})
+        msgs = history.findChildren("div", {'class': 'clearfix'}, recursive=False)
+        last_sender = None
+        for i, msg in enumerate(msgs):
             try:
-                with open(os.path.join(filepath, 'messages.html'), 'r', encoding='utf-8') as html_file:
-                    soup = BeautifulSoup(html_file, "lxml")
-                    history = soup.find('div', {'class': 'history'})
-                    service = history.findChildren("div", {'class': 'message service'})
-                    is_group = 'group' in service[1].select_one('div').text
-
-                    conv_usr = None if is_group else soup.select_one('div.page_header').find('div', {
-                        'class': 'text bold'}).text.strip()
-
-                files = list(Path(filepath).glob('*.html'))
-                for file in files:
-                    try:
-                        soup = BeautifulSoup(file.read_text(encoding='utf-8'), "lxml")
-                        history = soup.find('div', {'class': 'history'})
-                        msgs = history.findChildren("div", {'class': 'clearfix'}, recursive=False)
-                        last_sender = None
-                        for i, msg in enumerate(msgs):
-                            try:
-                                body = msg.find('div', {'class': 'body'})
-                                date = body.find('div', {'class': 'date'}).get('title')
-                                sender = body.find('div', {'class': 'from_name'})
-                                if sender is not None:
-                                    last_sender = sender.text.strip()
-
-                                sender = last_sender
-                                content = body.find('div', {'class': 'text'})
-
-                                if content is None:
-                                    media = body.find('div', {'class': 'media_wrap'})
-                                    body = media.find('div', {'class': 'body'})
-                                    if body is not None:
-                                        content = body.select_one('div.title').text.strip()
-                                    else:
-                                        content = media.next.next.attrs['class'][-1]
-                                    text = '$$media_omitted$$'
-                                else:
-                                    text = content.text.strip()
-
-                                text = _filter_text(text)
-
-                                groups = re.match('([\d]+).([\d]+).([\d]+)\s([\d]+):([\d]+):([\d]+)', date)
-                                groups = groups.groups()
-                                date = datetime(int(groups[2]), int(groups[1]), int(groups[0]), int(groups[3]),
-                                                int(groups[4]))
-
-                                messages.append(
-                                    {'datetime': date, 'user': sender, 'group': is_group, 'content': content,
-                                     'text': text, 'conv': conv_usr, 'social': 'telegram'})
-                            except Exception as e:
-                                print('Skip line {0} of {1}\t{2}'.format(i, str(file), str(e)))
-                        pbar.update(1)
-                    except Exception as e:
-                        print('Error while parsing {0}\t{1}'.format(str(file), str(e)))
+                body = msg.find('div', {'class': 'body'})
+                date = body.find('div', {'class': 'date'}).get('title')
+                sender = body.find('div', {'class': 'from_name'})
+                if sender is not None:
+                    last_sender = sender.text.strip()
+
+                sender = last_sender
+                content = body.find('div', {'class': 'text'})
+
+                if content is None:
+                    media = body.find('div', {'class': 'media_wrap'})
+                    body = media.find('div', {'class': 'body'})
+                    if body is not None:
+                        content = body.select_one('div.title').text.strip()
+                    else:
+                        content = media.next.next.attrs['class'][-1]
+                    text = '$$media_omitted$$'
+                else:
+                    content = content.text.strip()
+                    text = content
+
+                text = _filter_text(text)
+
+                groups = TELEGRAM_DATE.match(date)
+                groups = groups.groups()
+                date = datetime(int(groups[2]), int(groups[1]), int(groups[0]), int(groups[3]),
+                                int(groups[4]))
+
+                messages.append((date, sender, content, text))
             except Exception as e:
-                print('Error while parsing {0}\t{1}'.format(str(filepath), str(e)))
+                print('Skip line {0} of {1}\t{2}'.format(i, str(file), str(e)))
+    except Exception as e:
+        print('Error while parsing {0}\t{1}'.format(str(file), str(e)))
+
+    return from_rows(messages, is_group, conv_usr, 'telegram')
+
+
+def _classes(element):
+    return element.get('class', '').split()
+
+
+def _find(element, cls):
+    return next((x for x in element.iterdescendants('div') if cls in _classes(x)), None)
 
-    pbar.close()
-    return messages
 
+def _text(element):
+    return ''.join(element.itertext())
 
-def instagram_parser(path, myself):
+
+def _descendants(element):
+    # text and elements in document order, the way bs4 walks them with .next
+    if element.text:
+        yield element.text
+    for child in element:
+        yield child
+        yield from _descendants(child)
+        if child.tail:
+            yield child.tail
+
+
+def _next_elements(element):
+    yield from _descendants(element)
+    for ancestor in [element] + list(element.iterancestors()):
+        if ancestor.tail:
+            yield ancestor.tail
+        for sibling in ancestor.itersiblings():
+            yield sibling
+            yield from _descendants(sibling)
+            if sibling.tail:
+                yield sibling.tail
+
+
+def _telegram_metadata_lxml(filepath):
+    # only the head of the first page is read, up to the second service message
+    try:
+        header, history, service = None, None, []
+        for event, element in etree.iterparse(os.path.join(filepath, 'messages.html'), events=('start', 'end'),
+                                              html=True, encoding='utf-8'):
+            if element.tag != 'div':
+                continue
+            if event == 'start':
+                if history is None and 'history' in _classes(element):
+                    history = element
+            elif header is None and 'page_header' in _classes(element):
+                header = element
+            elif history is not None and ' '.join(_classes(element)) == 'message service' and \
+                    history in element.iterancestors():
+                service.append(element)
+                if header is not None and len(service) > 1:
+                    break
+
+        is_group = 'group' in _text(next(service[1].iterdescendants('div')))
+        conv_usr = None if is_group else _text(next(x for x in header.iterdescendants('div')
+                                                    if ' '.join(_classes(x)) == 'text bold')).strip()
+        return is_group, conv_usr
+    except Exception as e:
+        print('Error while parsing {0}\t{1}'.format(str(filepath), str(e)))
+        return None
+
+
+def _telegram_messages(file):
+    # a message is yielded when the next one starts, so that it is complete and the ones before can be dropped
+    history, pending = None, None
+    for event, element in etree.iterparse(str(file), events=('start', 'end'), html=True, encoding='utf-8'):
+        if history is None:
+            if event == 'start' and element.tag == 'div' and 'history' in _classes(element):
+                history = element
+        elif event == 'start' and element.getparent() is history:
+            if pending is not None:
+                yield pending
+                pending = None
+            while element.getprevious() is not None:
+                del history[0]
+            if element.tag == 'div' and 'clearfix' in _classes(element):
+                pending = element
+        elif event == 'end' and element is history:
+            break
+
+    if pending is not None:
+        yield pending
+
+
+def _parse_telegram_page_lxml(page):
+    file, is_group, conv_usr = page
     messages = []
+    try:
+        last_sender = None
+        for i, msg in enumerate(_telegram_messages(file)):
+            try:
+                body = _find(msg, 'body')
+                date = _find(body, 'date').get('title')
+                sender = _find(body, 'from_name')
+                if sender is not None:
+                    last_sender = _text(sender).strip()
+
+                sender = last_sender
+                content = _find(body, 'text')
+
+                if content is None:
+                    media = _find(body, 'media_wrap')
+                    body = _find(media, 'body')
+                    if body is not None:
+                        content = _text(_find(body, 'title')).strip()
+                    else:
+                        nodes = _next_elements(media)
+                        next(nodes)
+                        content = _classes(next(nodes))[-1]
+                    text = '$$media_omitted$$'
+                else:
+                    content = _text(content).strip()
+                    text = content
+
+                text = _filter_text(text)
+
+                groups = TELEGRAM_DATE.match(date)
+                groups = groups.groups()
+                date = datetime(int(groups[2]), int(groups[1]), int(groups[0]), int(groups[3]),
+                                int(groups[4]))
+
+                messages.append((date, sender, content, text))
+            except Exception as e:
+                print('Skip line {0} of {1}\t{2}'.format(i, str(file), str(e)))
+    except Exception as e:
+        print('Error while parsing {0}\t{1}'.format(str(file), str(e)))
+
+    return from_rows(messages, is_group, conv_usr, 'telegram')
+
+
+def instagram_parser(path, myself, pool=None, cache=None, engine='vectorized', since=None, until=None):
     files = list(Path(path).glob('./*/*.json'))
-    for file in tqdm(files, desc='Instagram'):
-        try:
-            raw = file.read_text(encoding='utf-8')
-            data = json.loads(raw)
+    sources = [_source(file, myself, *_window(since, until)) for file in files] if cache is not None else None
+    parse = partial(_parse_instagram_file_vectorized if engine == 'vectorized' else _parse_instagram_file,
+                    myself=myself)
+    if since is not None or until is not None:
+        parse = partial(_parse_between, parse, since, until)
+    return _parse_units(parse, files, 'Instagram', pool, cache, sources)
 
-            participants = [x['name'] for x in data['participants'] if x['name'] != myself]
-            if len(participants) > 1:
-                is_group = True
-                conv_usr = None
-            else:
-                is_group = False
-                conv_usr = participants[0].encode('latin1').decode()
-
-            for i, msg in enumerate(data['messages']):
-                try:
-                    user = msg['sender_name'].encode('latin1').decode()
-                    timestamp = int(msg['timestamp_ms']) / 1000
-                    date = datetime.fromtimestamp(timestamp)
-
-                    if 'share' in msg.keys():
-                        content = msg['share']
-                        text = '$$link$$'
-                    elif 'content' in msg.keys():
-                        content = msg['content']
-                        text = msg['content']
-                    else:
-                        content = None
-                        text = '$$media_omitted$$'
 
-                    text = _filter_text(text.encode('latin1').decode(), 'instagram')
+def _parse_instagram_file(file, myself):
+    messages = []
+    is_group, conv_usr = False, None
+    try:
+        raw = file.read_text(encoding='utf-8')
+        data = json.loads(raw)
+
+        participants = [x['name'] for x in data['participants'] if x['name'] != myself]
+        if len(participants) > 1:
+            is_group = True
+            conv_usr = None
+        else:
+            is_group = False
+            conv_usr = participants[0].encode('latin1').decode()
+
+        for i, msg in enumerate(data['messages']):
+            try:
+                user = msg['sender_name'].encode('latin1').decode()
+                timestamp = int(msg['timestamp_ms']) / 1000
+                date = datetime.fromtimestamp(timestamp)
+
+                if 'share' in msg.keys():
+                    content = msg['share'].get('link')
+                    text = '$$link$$'
+                elif 'content' in msg.keys():
+                    content = msg['content']
+                    text = msg['content']
+                else:
+                    content = None
+                    text = '$$media_omitted$$'
+
+                text = _filter_text(text.encode('latin1').decode(), 'instagram')
 
-                    messages.append({'datetime': date, 'user': user, 'group': is_group, 'content': content,
-                                     'text': text, 'conv': conv_usr, 'social': 'instagram'})
-                except Exception as e:
-                    print('Skip line {0} of {1}\t{2}'.format(i, str(file), str(e)))
-        except Exception as e:
-            print('Error while parsing {0}\t{1}'.format(str(file), str(e)))
+                messages.append((date, user, content, text))
+            except Exception as e:
+                print('Skip line {0} of {1}\t{2}'.format(i, str(file), str(e)))
+    except Exception as e:
+        print('Error while parsing {0}\t{1}'.format(str(file), str(e)))
+
+    return from_rows(messages, is_group, conv_usr, 'instagram')
+
+
+def _repair(values):
+    # instagram writes the utf-8 bytes of its strings as latin1 characters, a whole column is decoded at once
+    if len(values) == 0:
+        return []
+    joined = '\x00'.join(values)
+    repaired = joined.encode('latin1').decode().split('\x00')
+    if len(repaired) != len(values):
+        raise Exception('separator found in text')
+    return repaired
+
+
+def _messages_of(joined, pattern):
+    # the messages, each preceded by \x00, where pattern matches
+    starts = np.flatnonzero(np.frombuffer(joined.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32) == 0)
+    matches = [x.start() for x in pattern.finditer(joined)]
+    return np.unique(np.searchsorted(starts, matches, side='right') - 1).astype(np.int64)
+
+
+def _filter_instagram_texts(texts):
+    # same rules as _filter_text, applied to all the messages of a file at once
+    joined = '\x00' + '\x00'.join(texts)
+    texts = np.array(texts, dtype=object)
+    filtered = texts.copy()
+    escaped = _messages_of(joined, AMPERSAND)
+    filtered[escaped] = [html.unescape(x) for x in texts[escaped]]
+    for pattern in PATTERN_LIKE:
+        filtered[texts == pattern] = '♥'
+    filtered[_messages_of(joined.lower(), INSTAGRAM_LINK)] = '$$link$$'
+    return filtered.tolist()
+
+
+def _local_times(timestamps):
+    # the local times datetime.fromtimestamp gives for milliseconds since the epoch. The utc offset is looked up
+    # once per day, and for each message only on the days it changes
+    seconds = timestamps // 1000
+    days, inverse = np.unique(seconds // 86400, return_inverse=True)
+    first = np.array([time.localtime(x * 86400).tm_gmtoff for x in days.tolist()], dtype=np.int64)
+    last = np.array([time.localtime(x * 86400 + 86399).tm_gmtoff for x in days.tolist()], dtype=np.int64)
+    offsets = first[inverse]
+    changes = (first != last)[inverse]
+    offsets[changes] = [time.localtime(x).tm_gmtoff for x in seconds[changes].tolist()]
+    return (timestamps + offsets * 1000).astype('datetime64[ms]')
+
+
+def _parse_instagram_file_vectorized(file, myself):
+    # one json parse and one repair of each column. Files this cannot parse as _parse_instagram_file does,
+    # as those with missing fields or text that is not mojibake, go through the message by message parser
+    try:
+        raw = file.read_bytes()
+        data = orjson.loads(raw) if orjson is not None else json.loads(raw)
 
-    return messages
+        participants = [x['name'] for x in data['participants'] if x['name'] != myself]
+        is_group = len(participants) > 1
+        conv_usr = None if is_group else participants[0].encode('latin1').decode()
+
+        messages = data['messages']
+        users = _repair([msg['sender_name'] for msg in messages])
+        dates = _local_times(np.array([msg['timestamp_ms'] for msg in messages], dtype=object).astype(np.int64))
+
+        contents = [msg['share'].get('link') if 'share' in msg else msg.get('content') for msg in messages]
+        texts = _repair(['$$link$$' if 'share' in msg else msg['content'] if 'content' in msg
+                         else '$$media_omitted$$' for msg in messages])
+        texts = _filter_instagram_texts(texts)
+    except Exception:
+        return _parse_instagram_file(file, myself)
 
+    return from_columns(dates, users, contents, texts, is_group, conv_usr, 'instagram')
 
-def skype_parser(path, myself, emoticons):
+
+def skype_parser(path, myself, emoticons, pool=None, cache=None, stream=False, since=None, until=None):
     emoji_map = {}
     with open(emoticons, 'r', encoding='utf-8') as emofile:
         for line in emofile:
             splits = re.split(r'[\s]', line.strip())
             emoji_map[splits[0]] = splits[-1]
 
+    messages = concat([])
+    try:
+        filename = os.path.join(path, 'messages.json')
+        source = _source(filename, myself, *_window(since, until)) if cache is not None else None
+        cached = cache.get(*source) if source is not None else None
+        if cached is not None:
+            return concat([cached])
+
+        if stream and ijson is None:
+            print('ijson is not installed, messages.json is read at once')
+
+        if stream and ijson is not None:
+            parse = partial(_parse_skype_chunk, myself=myself, emoji_map=emoji_map, since=since, until=until)
+            messages = _parse_stream(parse, _skype_chunks(filename, SKYPE_CHUNK), 'Skype', pool)
+        else:
+            with open(filename, 'r', encoding='utf-8') as file:
+                data = json.load(file)['conversations']
+
+            parse = partial(_parse_skype_conversation, myself=myself, emoji_map=emoji_map, since=since,
+                            until=until)
+            messages = _parse_units(parse, data, 'Skype', pool)
+
+        if source is not None:
+            cache.put(*source, messages)
+    except Exception as e:
+        print('Error while parsing skype message\t{0}'.format(str(e)))
+
+    return messages
+
+
+def _skype_chunks(filename, size):
+    # conversations are read one message at a time, every field but MessageList makes the conversation header
+    with open(filename, 'rb') as file:
+        conv, key, builder, chunk, start = None, None, None, [], 0
+        for prefix, event, value in ijson.parse(file):
+            if prefix == 'conversations.item':
+                if builder is not None:
+                    conv[key] = builder.value
+                    builder = None
+                if event == 'start_map':
+                    conv, chunk, start = {}, [], 0
+                elif event == 'map_key':
+                    key = value
+                    builder = ijson.ObjectBuilder() if key != 'MessageList' else None
+                elif event == 'end_map' and (start == 0 or len(chunk) > 0):
+                    yield conv, start, chunk
+            elif builder is not None:
+                builder.event(event, value)
+            elif prefix.startswith('conversations.item.MessageList.item'):
+                if prefix == 'conversations.item.MessageList.item' and event == 'start_map':
+                    message = ijson.ObjectBuilder()
+                message.event(event, value)
+                if prefix == 'conversations.item.MessageList.item' and event == 'end_map':
+                    chunk.append(message.value)
+                    # the header is complete when MessageList comes last, as in the exports
+                    if len(chunk) == size and 'threadProperties' in conv and 'displayName' in conv:
+                        yield conv, start, chunk
+                        chunk, start = [], start + size
+
+
+def _parse_skype_chunk(chunk, myself, emoji_map, since=None, until=None):
+    conv, start, messages = chunk
+    return _parse_skype_messages(conv, start, messages, myself, emoji_map, since, until)
+
+
+def _parse_skype_conversation(conv, myself, emoji_map, since=None, until=None):
+    return _parse_skype_messages(conv, 0, conv['MessageList'], myself, emoji_map, since, until)
+
+
+def _parse_skype_messages(conv, start, messages_list, myself, emoji_map, since=None, until=None):
     messages = []
+    is_group, conv_usr = False, None
     try:
-        file = open(os.path.join(path, 'messages.json'), 'r', encoding='utf-8')
-        data = json.load(file)['conversations']
-        for conv in tqdm(data, desc='Skype'):
-            if conv['threadProperties'] is not None:
-                is_group = conv['threadProperties']['membercount'] > 1
-            else:
-                is_group = False
+        if conv['threadProperties'] is not None:
+            is_group = conv['threadProperties']['membercount'] > 1
+        else:
+            is_group = False
 
-            conv_usr = None if is_group else conv['displayName']
+        conv_usr = None if is_group else conv['displayName']
 
-            for i, msg in enumerate(conv['MessageList']):
-                try:
-                    prop = msg['properties']
-                    if prop is not None and 'isserversidegenerated' in prop.keys():
-                        if prop['isserversidegenerated'] == 'True':  # edited
-                            continue
+        for i, msg in enumerate(messages_list, start):
+            try:
+                prop = msg['properties']
+                if prop is not None and 'isserversidegenerated' in prop.keys():
+                    if prop['isserversidegenerated'] == 'True':  # edited
+                        continue
 
-                    date = msg['originalarrivaltime']
-                    groups = re.match('([\d]+)-([\d]+)-([\d]+)T([\d]+):([\d]+):([\d]+)', date)
-                    groups = groups.groups()
+                date = msg['originalarrivaltime']
+                groups = SKYPE_DATE.match(date)
+                groups = groups.groups()
 
-                    date = datetime(int(groups[0]), int(groups[1]), int(groups[2]), int(groups[3]),
-                                    int(groups[4])) + timedelta(hours=2)
+                date = datetime(int(groups[0]), int(groups[1]), int(groups[2]), int(groups[3]),
+                                int(groups[4])) + timedelta(hours=2)
+                # the html of messages out of the range is not parsed
+                if (since is not None and date < since) or (until is not None and date >= until):
+                    continue
 
-                    user = msg['displayName']
-                    content = msg['content']
+                user = msg['displayName']
+                content = msg['content']
 
+                if SKYPE_PLAIN.fullmatch(content) is not None:
+                    # the html parser would only wrap plain text in a paragraph
+                    text = content
+                else:
                     body = BeautifulSoup(content, "lxml").select_one('body')
                     if body is None:
                         continue
@@ -293,17 +933,15 @@ def skype_parser(path, myself, emoticons):
                         continue
 
                     text = _parse_skype(content, emoji_map)
+                    content = content.text
 
-                    if user is None:
-                        user = myself
+                if user is None:
+                    user = myself
 
-                    messages.append({'datetime': date, 'user': user, 'group': is_group, 'content': content,
-                                     'text': text, 'conv': conv_usr, 'social': 'skype'})
-                except Exception as e:
-                    print('Skip line {0}\t{1}'.format(i, str(e)))
-
-        file.close()
+                messages.append((date, user, content, text))
+            except Exception as e:
+                print('Skip line {0}\t{1}'.format(i, str(e)))
     except Exception as e:
         print('Error while parsing skype message\t{0}'.format(str(e)))
 
-    return messages
+    return from_rows(messages, is_group, conv_usr, 'skype')
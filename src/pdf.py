@@ -0,0 +1,81 @@
+import io
+import os
+import zlib
+
+HEADER = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+
+CATALOG = 1
+
+PAGES = 2
+
+
+class PdfReport:
+    # pages are written as soon as they are added, so that only one slide is kept in memory.
+    # The page tree, the catalog and the cross references are written on close
+    def __init__(self, path, compression='jpeg', quality=75):
+        self.path = path
+        self.compression = compression
+        self.quality = quality
+        self.offsets = {}
+        self.pages = []
+        self.next_id = PAGES + 1
+        self.file = open(path, 'wb')
+        self.file.write(HEADER)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            # a report missing some slides is not left behind
+            self.file.close()
+            os.remove(self.path)
+
+    def _write(self, obj, body, stream=None):
+        self.offsets[obj] = self.file.tell()
+        self.file.write(b'%d 0 obj\n' % obj + body)
+        if stream is not None:
+            self.file.write(b'\nstream\n' + stream + b'\nendstream')
+        self.file.write(b'\nendobj\n')
+
+    def _add_object(self, body, stream=None):
+        obj = self.next_id
+        self.next_id += 1
+        self._write(obj, body, stream)
+        return obj
+
+    def add(self, img):
+        img = img.convert('RGB') if img.mode != 'RGB' else img
+        width, height = img.size
+        if self.compression == 'jpeg':
+            data = io.BytesIO()
+            img.save(data, 'JPEG', quality=self.quality)
+            data = data.getvalue()
+            encoding = b'/DCTDecode'
+        else:
+            data = zlib.compress(img.tobytes())
+            encoding = b'/FlateDecode'
+
+        image = self._add_object(b'<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceRGB '
+                                 b'/BitsPerComponent 8 /Filter %s /Length %d >>' % (width, height, encoding, len(data)),
+                                 data)
+        content = b'q %d 0 0 %d 0 0 cm /image Do Q' % (width, height)
+        contents = self._add_object(b'<< /Length %d >>' % len(content), content)
+        self.pages.append(self._add_object(
+            b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Resources << /XObject << /image %d 0 R >> '
+            b'/ProcSet [/PDF /ImageC] >> /Contents %d 0 R >>' % (PAGES, width, height, image, contents)))
+
+    def close(self):
+        kids = b' '.join(b'%d 0 R' % x for x in self.pages)
+        self._write(PAGES, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(self.pages)))
+        self._write(CATALOG, b'<< /Type /Catalog /Pages %d 0 R >>' % PAGES)
+
+        xref = self.file.tell()
+        self.file.write(b'xref\n0 %d\n0000000000 65535 f \n' % self.next_id)
+        for obj in range(1, self.next_id):
+            self.file.write(b'%010d 00000 n \n' % self.offsets[obj])
+        self.file.write(b'trailer\n<< /Size %d /Root %d 0 R >>\n' % (self.next_id, CATALOG))
+        self.file.write(b'startxref\n%d\n%%%%EOF\n' % xref)
+        self.file.close()
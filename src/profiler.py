@@ -0,0 +1,77 @@
+import os
+import sys
+import time
+import json
+import cProfile
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# labels that tell apart the runs of the same stage, as parse:telegram or Analyzer.plot_emoji:Emily
+NAMING = ['platform', 'user']
+
+
+def peak_rss():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class Profiler:
+    # stages are timed only when enabled, a disabled profiler just runs them. The stage named by target, as
+    # Analyzer.plot_emoji or Analyzer.plot_emoji:Emily, is also run under cProfile and its stats are dumped
+    def __init__(self, enabled=False, target=None, folder=None, **labels):
+        self.enabled = enabled or target is not None
+        self.target = target
+        self.folder = folder
+        self.labels = labels
+        self.records = []
+
+    @contextmanager
+    def stage(self, name, **labels):
+        record = {'stage': name, **self.labels, **labels}
+        if not self.enabled:
+            yield record
+            return
+
+        stage_id = ':'.join([name] + [record[x] for x in NAMING if x in record])
+        profile = cProfile.Profile() if self.target in {name, stage_id} else None
+        wall, cpu, peak = time.perf_counter(), time.process_time(), peak_rss()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield record
+        finally:
+            if profile is not None:
+                profile.disable()
+                profile.dump_stats(os.path.join(self.folder, 'profile_' + stage_id.replace(':', '_') + '.prof'))
+            # cpu time is the one of the whole process, parsers running in threads share it. peak_rss is the high-water
+            # mark of the process so far, peak_rss_increase how much the stage raised it: a stage that stays below an
+            # earlier peak reports 0, and parsers running in threads share the increase
+            end = peak_rss()
+            record.update(wall=time.perf_counter() - wall, cpu=time.process_time() - cpu, peak_rss=end,
+                          peak_rss_increase=None if end is None else end - peak)
+            self.records.append(record)
+
+    def call(self, func, *args):
+        # the stage takes the name of the function, as Analyzer.plot_emoji or draw_stats
+        with self.stage(func.__qualname__):
+            return func(*args)
+
+    def save(self, path, wall):
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(record['stage'], {'calls': 0, 'wall': 0, 'cpu': 0, 'peak_rss_increase': 0})
+            total['calls'] += 1
+            total['wall'] += record['wall']
+            total['cpu'] += record['cpu']
+            total['peak_rss_increase'] += record['peak_rss_increase'] or 0
+
+        with open(path, 'w', encoding='utf-8') as json_file:
+            json.dump({'wall': wall, 'peak_rss': peak_rss(), 'totals': totals, 'stages': self.records}, json_file,
+                      indent=1)